@@ -10,7 +10,8 @@ from app.api import (
     workout_context,
     plan_parser,
     auth,
-    summary
+    summary,
+    dashboard
 )
 
 api_router = APIRouter()
@@ -26,4 +27,5 @@ api_router.include_router(ai_coach.router, prefix="/ai-coach", tags=["ai-coach"]
 api_router.include_router(workout_context.router, prefix="/workout-context", tags=["workout-context"])
 api_router.include_router(plan_parser.router, prefix="/plan-parser", tags=["plan-parser"])
 api_router.include_router(strava.router, prefix="/auth/strava", tags=["strava"])
-api_router.include_router(summary.router, prefix="/summary", tags=["summary"]) 
\ No newline at end of file
+api_router.include_router(summary.router, prefix="/summary", tags=["summary"]) 
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
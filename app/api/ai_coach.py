@@ -1,5 +1,7 @@
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from typing import AsyncIterator, List, Dict, Any
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 from app.database import get_session
 from app.models.user import User
@@ -30,6 +32,53 @@ async def chat_with_coach(
             detail=str(e)
         )
 
+@router.post("/chat/batch")
+async def chat_batch(
+    messages: List[str] = Body(..., embed=True),
+    user_id: int = 1,  # Default to user 1 for now
+    session: Session = Depends(get_session)
+) -> Dict[str, List[str]]:
+    """Answer several independent coaching messages in one request."""
+    try:
+        replies = await asyncio.gather(
+            *(ai_coach_service.get_coaching_response(m, session, user_id) for m in messages)
+        )
+        return {"messages": list(replies)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: Request,
+    message: str = Body(..., embed=True),
+    user_id: int = 1,  # Default to user 1 for now
+    session: Session = Depends(get_session)
+) -> StreamingResponse:
+    """
+    Stream the coach's reply while it is being generated.
+    
+    Plain text by default; server-sent events when the client accepts text/event-stream.
+    """
+    try:
+        fragments = await ai_coach_service.stream_coaching_response(message, session, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(_server_sent_events(fragments), media_type="text/event-stream")
+    return StreamingResponse(fragments, media_type="text/plain; charset=utf-8")
+
+async def _server_sent_events(fragments: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Frame text fragments as SSE messages, ending with a `done` event"""
+    async for fragment in fragments:
+        yield "".join(f"data: {line}\n" for line in fragment.split("\n")) + "\n"
+    yield "event: done\ndata: \n\n"
+
 @router.get("/analysis", response_model=Dict[str, Any])
 async def get_coach_analysis(
     current_user: User = Depends(get_current_user),
@@ -0,0 +1,43 @@
+import hashlib
+import orjson
+from fastapi import APIRouter, Depends, Request, Response
+from sqlmodel import Session, select
+
+from app.api.auth import get_current_user
+from app.database import get_session
+from app.crud.training import get_trainings
+from app.models.strava import StravaToken
+from app.models.user import User
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+# plan_source values that mark a training as part of a plan
+PLAN_SOURCES = ["coach_photo", "ai_generated"]
+
+@router.get("/")
+def get_dashboard(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+) -> Response:
+    """Everything the dashboard needs in one response: recent trainings, plan workouts, Strava status and profile
+
+    A plain def, so FastAPI runs the blocking queries in its threadpool. The body
+    carries an ETag; a matching If-None-Match gets an empty 304 instead.
+    """
+    user_id = current_user.id
+    plan = get_trainings(session, user_id, limit=1000, plan_sources=PLAN_SOURCES)
+    recent = get_trainings(session, user_id, limit=1000, exclude_plan_sources=PLAN_SOURCES)
+    strava_token = session.exec(select(StravaToken.id).where(StravaToken.user_id == user_id)).first()
+    
+    body = orjson.dumps({
+        # Oldest first, so the client can take the latest entries from the end
+        "recent": [t.dict() for t in reversed(recent)],
+        "plan": [t.dict() for t in reversed(plan)],
+        "strava_connected": strava_token is not None,
+        "profile": current_user.dict(exclude={"hashed_password"}),
+    })
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
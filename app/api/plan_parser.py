@@ -65,11 +65,8 @@ async def parse_plan_from_image(
         except Exception as e:
             raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Convert binary data to base64 for the parser service
-        base64_image = base64.b64encode(image_data).decode('utf-8')
-        
         # Parse the plan
-        result = await plan_parser.parse_plan_from_image(base64_image, user_id, session)
+        result = await plan_parser.parse_plan_from_image(image_data, user_id, session)
         
         return result
         
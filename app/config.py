@@ -12,8 +12,12 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     OPENAI_API_KEY: str = ""
+    # Most OpenAI requests a service keeps in flight at once (e.g. batch image parses)
+    OPENAI_MAX_CONCURRENCY: int = 8
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
+    # Validate emails with pydantic's EmailStr instead of the cheaper pattern check
+    STRICT_EMAIL_VALIDATION: bool = False
 
     # Strava API Configuration
     STRAVA_CLIENT_ID: str = ""
@@ -1,8 +1,10 @@
 from sqlmodel import Session, select
+from sqlalchemy import inspect, or_, text
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from datetime import date, timedelta
 
-from app.models.training import Training
+from app.models.training import Training, WorkoutStatus
 from app.schemas.training import TrainingCreate, TrainingUpdate
 
 def get_training(session: Session, training_id: int) -> Optional[Training]:
@@ -15,24 +17,46 @@ def get_trainings(
     skip: int = 0,
     limit: int = 100,
     start_date: Optional[date] = None,
-    end_date: Optional[date] = None
+    end_date: Optional[date] = None,
+    plan_sources: Optional[List[str]] = None,
+    exclude_plan_sources: Optional[List[str]] = None
 ) -> List[Training]:
-    """Get training sessions for a user with optional date filtering"""
+    """Get training sessions for a user with optional date and plan source filtering"""
     query = select(Training).where(Training.user_id == user_id)
     
     if start_date:
         query = query.where(Training.date >= start_date)
     if end_date:
         query = query.where(Training.date <= end_date)
+    if plan_sources:
+        query = query.where(Training.plan_source.in_(plan_sources))
+    if exclude_plan_sources:
+        # Trainings without a source (manual logs) count as "not from these sources"
+        query = query.where(or_(Training.plan_source.is_(None), Training.plan_source.not_in(exclude_plan_sources)))
     
     query = query.offset(skip).limit(limit).order_by(Training.date.desc())
     return list(session.exec(query).all())
 
 def create_training(session: Session, training: TrainingCreate) -> Training:
-    """Create a new training session"""
+    """Create a new training session
+
+    A plan workout that already exists (uq_training_plan_day) is returned as is.
+    """
     db_training = Training(**training.dict())
     session.add(db_training)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        existing = session.exec(select(Training).where(
+            Training.user_id == db_training.user_id,
+            Training.date == db_training.date,
+            Training.type == db_training.type,
+            Training.plan_source == db_training.plan_source
+        )).first()
+        if existing is None:
+            raise
+        return existing
     session.refresh(db_training)
     return db_training
 
@@ -88,3 +112,53 @@ def get_recent_trainings(
     ).order_by(Training.date.desc())
     
     return list(session.exec(query).all())
+
+def delete_duplicate_trainings(session: Session) -> int:
+    """Remove duplicate plan workouts (user_id, date, type, plan_source), keeping one per group.
+
+    The kept row is the one the user touched: not PLANNED first, then one with
+    actual data or notes, then the newest. Manual logs (NULL plan_source) are
+    never touched. Run before adding the uq_training_plan_day index to an existing table.
+    """
+    result = session.execute(text("""
+        DELETE FROM training
+        WHERE plan_source IS NOT NULL AND id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, date, type, plan_source
+                    ORDER BY
+                        CASE WHEN status = :planned THEN 1 ELSE 0 END,
+                        CASE WHEN actual_distance IS NOT NULL OR actual_duration IS NOT NULL
+                             OR notes IS NOT NULL THEN 0 ELSE 1 END,
+                        id DESC
+                ) AS rn
+                FROM training
+                WHERE plan_source IS NOT NULL
+            ) ranked
+            WHERE rn = 1
+        )
+    """), {"planned": WorkoutStatus.PLANNED.name})
+    session.commit()
+    return result.rowcount
+
+def add_training_unique_index(session: Session) -> int:
+    """One-shot migration of an existing training table to the uq_training_plan_day rule.
+
+    Does nothing once the index exists, so it is safe to run on every startup.
+    """
+    inspector = inspect(session.get_bind())
+    if not inspector.has_table("training"):
+        return 0
+    if any(index["name"] == "uq_training_plan_day" for index in inspector.get_indexes("training")):
+        return 0
+    
+    removed = delete_duplicate_trainings(session)
+    # An earlier build created a full-table uq_training_day that also covered manual logs
+    session.execute(text("DROP INDEX IF EXISTS uq_training_day"))
+    session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_training_plan_day "
+        "ON training (user_id, date, type, plan_source) "
+        "WHERE plan_source IS NOT NULL"
+    ))
+    session.commit()
+    return removed
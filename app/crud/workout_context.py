@@ -0,0 +1,66 @@
+from sqlmodel import Session, select
+from sqlalchemy import insert, inspect, text
+
+from app.models.workout_context import SCALE_BITS, WorkoutContext, WorkoutInterval, write_interval_rows
+
+# Rows per executemany batch when backfilling
+INTERVAL_BATCH_SIZE = 1000
+
+def replace_workout_intervals(session: Session, context: WorkoutContext) -> int:
+    """Rewrite a context's WorkoutInterval rows from its intervals_data in one bulk insert
+
+    Saving a context already does this; use it for rows changed outside the ORM.
+    """
+    count = write_interval_rows(session.connection(), context)
+    session.commit()
+    return count
+
+def backfill_workout_intervals(session: Session) -> int:
+    """Fill WorkoutInterval from intervals_data for contexts saved before the table existed.
+
+    Run once after creating the workoutinterval table.
+    """
+    done = set(session.exec(select(WorkoutInterval.workout_context_id).distinct()))
+    batch = []
+    count = 0
+    for context in session.exec(select(WorkoutContext).where(WorkoutContext.intervals_data.is_not(None))):
+        if context.id in done:
+            continue
+        batch.extend(context.interval_records())
+        count += 1
+        if len(batch) >= INTERVAL_BATCH_SIZE:
+            session.execute(insert(WorkoutInterval), batch)
+            batch = []
+    if batch:
+        session.execute(insert(WorkoutInterval), batch)
+    session.commit()
+    return count
+
+def add_workout_context_indexes(session: Session) -> None:
+    """Create the ix_wc_* indexes on an existing workoutcontext table (idempotent, run at startup)"""
+    session.execute(text("CREATE INDEX IF NOT EXISTS ix_wc_user_activity ON workoutcontext (user_id, strava_activity_id)"))
+    session.execute(text("CREATE INDEX IF NOT EXISTS ix_wc_user_created ON workoutcontext (user_id, created_at)"))
+    session.commit()
+
+def migrate_scale_columns(session: Session) -> int:
+    """Pack the old per-field 1-10 scale columns of an existing workoutcontext table into scales_packed.
+
+    A no-op once scales_packed exists, so it is safe to run on every startup.
+    The old columns are left in place (the model no longer maps them).
+    """
+    inspector = inspect(session.get_bind())
+    if not inspector.has_table("workoutcontext"):
+        return 0
+    columns = {column["name"] for column in inspector.get_columns("workoutcontext")}
+    if "scales_packed" in columns:
+        return 0
+    
+    session.execute(text("ALTER TABLE workoutcontext ADD COLUMN scales_packed BIGINT NOT NULL DEFAULT 0"))
+    # Each value times 2**offset is its nibble; out-of-range values count as not recorded
+    packed = " + ".join(
+        f"(CASE WHEN {name} BETWEEN 1 AND 10 THEN CAST({name} AS BIGINT) ELSE 0 END) * {1 << shift}"
+        for name, shift in SCALE_BITS.items() if name in columns
+    )
+    count = session.execute(text(f"UPDATE workoutcontext SET scales_packed = {packed}")).rowcount if packed else 0
+    session.commit()
+    return count
@@ -1,15 +1,22 @@
 import streamlit as st
 import requests
+import orjson
 import plotly.express as px
 import pandas as pd
-import json
+import csv
+import copy
 from datetime import datetime, timedelta
 from PIL import Image
 import base64
-from io import BytesIO
+import html
+from io import BytesIO, StringIO
 import streamlit.components.v1 as components
 import time
 import os
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure the page
 st.set_page_config(
@@ -21,53 +28,213 @@ st.set_page_config(
 # API Configuration
 API_URL = "http://localhost:8000/api/v1"
 
+# (connect, read) timeout for every backend call
+_HTTP_TIMEOUT = (3, 30)
+
+# Reading a plan photo runs a vision model, so give it more time to answer
+_UPLOAD_TIMEOUT = (3, 120)
+
+# Longest pause allowed between chunks once a streamed reply has started (seconds)
+_STREAM_READ_TIMEOUT = 120
+
+@st.cache_resource
+def _api_session():
+    """One pooled HTTP session, kept alive across reruns"""
+    session = requests.Session()
+    # The session is shared by every user of this process, so never keep cookies on it
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    # Retry connection errors and gateway failures with backoff. POSTs are left out on purpose:
+    # several of them create records (plans, workout contexts) and must not be replayed.
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=["GET", "DELETE"])
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+_SESSION = _api_session()
+
+# Seconds between session-cookie probes
+SESSION_PROBE_INTERVAL = 60
+
+# Max characters of an error response body shown to the user
+ERROR_BODY_LIMIT = 200
+
+# Entries kept by _conditional_get before its store is reset
+ETAG_CACHE_SIZE = 256
+
+@st.cache_resource
+def _executor():
+    """Shared pool for background API requests, built once rather than on every rerun"""
+    return ThreadPoolExecutor(max_workers=4)
+
+_EXECUTOR = _executor()
+
+# plan_source values that mark a training as part of a plan
+PLAN_SOURCES = ('coach_photo', 'ai_generated')
+
+# Emoji shown next to each (title-cased) workout type
+TYPE_EMOJI = {
+    'Easy Run': '🏃', 'Long Run': '🏃‍♂️', 'Intervals': '⚡',
+    'Tempo': '🔥', 'Hills': '⛰️', 'Recovery': '😌', 'Rest': '😴'
+}
+
+# Initial session state values
+_DEFAULTS = {
+    "token": None,
+    "user": None,
+    "user_data": {},
+    "training_plan": None,
+    "profile_data": {},
+    "chat_history": [],
+    "current_page": "Dashboard",
+    "num_activities": 10,
+}
+
+# Columns plotted on the progress page
+METRIC_COLUMNS = ['date', 'distance', 'pace', 'heart_rate']
+
 def load_css():
     """Load external CSS file"""
     with open('app/frontend/style.css') as f:
         st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
 
+def _json(response):
+    """Parse a response body with orjson (works on the raw bytes, no decode step)"""
+    return orjson.loads(response.content)
+
+def _prefetch(requests_by_path, headers=None):
+    """Start GETs in the background; results are picked up by _take_prefetched"""
+    st.session_state._prefetch = {
+        path: _EXECUTOR.submit(_SESSION.get, f"{API_URL}{path}", params=params, headers=headers, timeout=_HTTP_TIMEOUT)
+        for path, params in requests_by_path.items()
+    }
+
+def _take_prefetched(path):
+    """Return the prefetched response for a path (once), or None"""
+    future = st.session_state.get('_prefetch', {}).pop(path, None)
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except requests.RequestException:
+        return None
+
 def get_headers():
     """Get headers for authenticated requests"""
-    token = st.session_state.get('token')
-    if token:
-        return {"Authorization": f"Bearer {token}"}
+    return _bearer(st.session_state.get('token'))
+
+def _bearer(token):
+    """Authorization header for a token (empty when logged out)"""
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_activities(limit: int, user_token: str):
+    """Recent Strava activities; the token is part of the cache key so users never share entries"""
+    response = _SESSION.get(f"{API_URL}/strava/activities", params={"limit": limit}, headers=_bearer(user_token), timeout=_HTTP_TIMEOUT)
+    response.raise_for_status()
+    return _json(response)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _fetch_workout_context(strava_id, user_token: str):
+    """Saved context for an activity, or None if there is none yet"""
+    response = _SESSION.get(f"{API_URL}/workout-context/{strava_id}", headers=_bearer(user_token), timeout=_HTTP_TIMEOUT)
+    if response.status_code != 200:
+        return None
+    return _json(response)
+
+def _start_interval_analytics(user_token: str):
+    """Start the interval analytics GET in the background; returns the response future"""
+    return _EXECUTOR.submit(
+        _SESSION.get, f"{API_URL}/workout-context/analytics/intervals", headers=_bearer(user_token), timeout=_HTTP_TIMEOUT
+    )
+
+@st.cache_resource
+def _etag_store():
+    """(path, params, token) -> (ETag, parsed body) for _conditional_get, shared across reruns"""
     return {}
 
+def _conditional_get(path, user_token, params=None):
+    """GET an API path with If-None-Match, reusing the stored body when the server answers 304
+
+    Keyed by token, so users never share entries. Servers that don't send an
+    ETag just get a plain GET every time.
+    """
+    store = _etag_store()
+    key = (path, tuple(sorted((params or {}).items())), user_token)
+    headers = _bearer(user_token)
+    cached = store.get(key)
+    if cached:
+        headers['If-None-Match'] = cached[0]
+    
+    response = _SESSION.get(f"{API_URL}{path}", params=params, headers=headers, timeout=_HTTP_TIMEOUT)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    data = _json(response)
+    
+    etag = response.headers.get('ETag')
+    if etag:
+        if len(store) >= ETAG_CACHE_SIZE:
+            store.clear()
+        store[key] = (etag, data)
+    return data
+
+# When these TTLs expire the fetch revalidates with the stored ETag instead of re-downloading
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_trainings(user_id: int, user_token: str):
+    """All trainings for a user"""
+    return _conditional_get("/training", user_token, params={"user_id": user_id})
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _fetch_dashboard(user_token: str):
+    """Dashboard payload: recent trainings, plan workouts, Strava status and profile"""
+    return _conditional_get("/dashboard/", user_token)
+
+def _invalidate_trainings():
+    """Drop the cached trainings and dashboard after a plan is saved or cleared"""
+    _fetch_trainings.clear()
+    _fetch_dashboard.clear()
+
+def _dashboard(user_token: str):
+    """Dashboard payload, taken from the login prefetch when there is one"""
+    # Outside _fetch_dashboard: a cached function must not consume session state
+    response = _take_prefetched("/dashboard/")
+    if response is not None and response.ok:
+        return _json(response)
+    return _fetch_dashboard(user_token)
+
 def init_session_state():
     """Initialize session state variables."""
-    if "token" not in st.session_state:
-        st.session_state.token = None
-    if "user" not in st.session_state:
-        st.session_state.user = None
-    if "user_data" not in st.session_state:
-        st.session_state.user_data = {}
-    if "training_plan" not in st.session_state:
-        st.session_state.training_plan = None
-    if "profile_data" not in st.session_state:
-        st.session_state.profile_data = {}
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+    for key, value in _DEFAULTS.items():
+        # Copy so sessions never share the same mutable default
+        st.session_state.setdefault(key, copy.copy(value))
 
 def check_session_cookie():
     """Check for existing session cookie and restore session if valid."""
+    # Only probe the backend once per interval; reruns in between reuse the last outcome
+    now = time.time()
+    if now - st.session_state.get('_session_probe_at', 0) < SESSION_PROBE_INTERVAL:
+        return bool(st.session_state.get('token'))
+    st.session_state._session_probe_at = now
+    
     try:
         # Make a request to check if we have a valid session
-        response = requests.get(
+        response = _SESSION.get(
             f"{API_URL}/auth/session",
-            timeout=5
+            timeout=_HTTP_TIMEOUT
         )
         if response.status_code == 200:
-            session_data = response.json()
+            session_data = _json(response)
             if session_data.get("token"):
                 # Test if the token is still valid
-                test_response = requests.get(
+                test_response = _SESSION.get(
                     f"{API_URL}/auth/me",
                     headers={"Authorization": f"Bearer {session_data['token']}"},
-                    timeout=5
+                    timeout=_HTTP_TIMEOUT
                 )
                 if test_response.status_code == 200:
                     st.session_state.token = session_data["token"]
-                    st.session_state.user = test_response.json()
+                    st.session_state.user = _json(test_response)
                     return True
     except Exception as e:
         st.debug(f"Session check error: {str(e)}")
@@ -101,7 +268,8 @@ def login():
                     with requests.Session() as session:
                         response = session.post(
                             f"{API_URL}/auth/token",
-                            data={"username": email, "password": password}
+                            data={"username": email, "password": password},
+                            timeout=_HTTP_TIMEOUT
                         )
                         if response.status_code == 200:
                             token_data = response.json()
@@ -110,10 +278,20 @@ def login():
                             # Get user data
                             user_response = session.get(
                                 f"{API_URL}/auth/me",
-                                headers={"Authorization": f"Bearer {token_data['access_token']}"}
+                                headers={"Authorization": f"Bearer {token_data['access_token']}"},
+                                timeout=_HTTP_TIMEOUT
                             )
                             if user_response.status_code == 200:
                                 st.session_state.user = user_response.json()
+                                # Warm the dashboard data while the page switches over
+                                since = datetime.utcnow() - timedelta(days=14)
+                                _prefetch(
+                                    {
+                                        "/dashboard/": None,
+                                        "/metrics": {"user_id": 1, "since": since.isoformat()},
+                                    },
+                                    headers={"Authorization": f"Bearer {token_data['access_token']}"}
+                                )
                                 st.success("Login successful!")
                                 st.rerun()
                         else:
@@ -131,13 +309,14 @@ def login():
             
             if submitted:
                 try:
-                    response = requests.post(
+                    response = _SESSION.post(
                         f"{API_URL}/auth/register",
                         json={
                             "email": reg_email,
                             "password": reg_password,
                             "name": reg_name
-                        }
+                        },
+                        timeout=_HTTP_TIMEOUT
                     )
                     if response.status_code == 200:
                         st.success("Registration successful! Please log in.")
@@ -152,7 +331,7 @@ def logout():
     """Logout and clear session state."""
     try:
         # Clear server-side session
-        requests.post(f"{API_URL}/auth/logout")
+        _SESSION.post(f"{API_URL}/auth/logout", timeout=_HTTP_TIMEOUT)
     except:
         pass
     
@@ -235,10 +414,6 @@ def main():
         st.session_state.current_page = "Settings"
         st.rerun()
     
-    # Initialize current page if not set
-    if "current_page" not in st.session_state:
-        st.session_state.current_page = "Dashboard"
-    
     # Route to appropriate page
     if st.session_state.current_page == "Dashboard":
         show_dashboard()
@@ -255,33 +430,6 @@ def main():
     elif st.session_state.current_page == "Settings":
         show_settings()
 
-def load_profile_data():
-    """Load user profile data from API"""
-    try:
-        response = requests.get(f"{API_URL}/users/profile", timeout=5)
-        if response.status_code == 200:
-            st.session_state.profile_data = response.json()
-        else:
-            st.error(f"Failed to load profile: {response.text}")
-    except Exception as e:
-        st.error(f"Error loading profile data: {str(e)}")
-
-def load_training_plan():
-    """Load training plan data from API"""
-    try:
-        response = requests.get(f"{API_URL}/training?user_id=1", timeout=10)
-        if response.status_code == 200:
-            trainings = response.json()
-            # Filter for planned/coach-generated workouts
-            plan_workouts = [t for t in trainings if t.get('plan_source') in ['coach_photo', 'ai_generated']]
-        else:
-            plan_workouts = []
-    except Exception as e:
-        st.error(f"Error loading training plan: {str(e)}")
-        plan_workouts = []
-    
-    return plan_workouts
-
 def show_daily_log():
     st.header("Daily Training Log")
     
@@ -328,18 +476,26 @@ def show_progress():
     """Show progress metrics and charts."""
     st.header("Progress")
     
-    # Get metrics data
+    # Get metrics data (only the last 2 weeks are plotted)
+    since = datetime.utcnow() - timedelta(days=14)
     try:
-        response = requests.get(f"{API_URL}/metrics?user_id=1", timeout=5)
+        response = _take_prefetched("/metrics")
+        if response is None:
+            response = _SESSION.get(
+                f"{API_URL}/metrics",
+                params={"user_id": 1, "since": since.isoformat()},
+                timeout=_HTTP_TIMEOUT
+            )
         if response.status_code == 200:
-            metrics_data = response.json()
+            metrics_data = _json(response)
             
-            # Convert to DataFrame for easier plotting
-            df = pd.DataFrame(metrics_data)
-            df['date'] = pd.to_datetime(df['date'])
+            # Only materialize the columns we plot
+            df = pd.DataFrame.from_records(metrics_data, columns=METRIC_COLUMNS)
+            df['date'] = pd.to_datetime(df['date'], utc=True, format='ISO8601')
+            df = df.astype({'distance': 'float32', 'pace': 'float32', 'heart_rate': 'float32'})
             
-            # Filter last 2 weeks
-            two_weeks_ago = pd.Timestamp.now() - pd.Timedelta(days=14)
+            # Filter last 2 weeks (in case the backend ignores `since`)
+            two_weeks_ago = pd.Timestamp(since, tz='UTC')
             df = df[df['date'] >= two_weeks_ago]
             
             if not df.empty:
@@ -382,7 +538,7 @@ def show_progress():
             else:
                 st.info("No metrics data available for the last 2 weeks.")
         else:
-            st.error(f"Failed to load metrics: {response.text}")
+            st.error(f"Failed to load metrics: {response.text[:ERROR_BODY_LIMIT]}")
     except Exception as e:
         st.error(f"Error loading metrics: {str(e)}")
 
@@ -453,6 +609,112 @@ def show_profile():
                 st.success("Profile updated successfully!")
                 st.rerun()
 
+def _format_activity_date(start_date: str) -> str:
+    """Format an ISO start date, e.g. 'January 15, 2024 at 7:00 AM'"""
+    if not start_date:
+        return "Unknown Date"
+    try:
+        date_obj = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        return date_obj.strftime('%B %d, %Y at %I:%M %p')
+    except ValueError:
+        # Fallback to just the date part if parsing fails
+        return start_date[:10]
+
+def _format_speed_as_pace(speed) -> str:
+    """Convert a speed in m/s to a MM:SS min/km pace string"""
+    if not speed or speed <= 0:
+        return "N/A"
+    pace_min_per_km = 1000 / (speed * 60)
+    minutes = int(pace_min_per_km)
+    seconds = int((pace_min_per_km - minutes) * 60)
+    return f"{minutes}:{seconds:02d} min/km"
+
+# Metric box markup, bound once as a str.format method
+_METRIC_TPL = '<div class="metric-container"><div class="metric-label">{label}</div><div class="metric-value">{value}</div></div>'.format
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _activities_html(activities_bytes: bytes) -> str:
+    """Render the Strava activities list as a single HTML block.
+
+    Keyed on the raw response body so unchanged activity lists are served
+    from cache instead of being rebuilt on every rerun.
+    """
+    cards = []
+    for activity in orjson.loads(activities_bytes):
+        name = html.escape(activity.get('name', 'Unknown Activity'))
+        formatted_date = _format_activity_date(activity.get('start_date', ''))
+
+        avg_hr = activity.get('average_heartrate')
+        max_hr = activity.get('max_heartrate')
+        avg_cadence = activity.get('average_cadence')
+        key_metrics = "".join([
+            _METRIC_TPL(label="Distance", value=f"{activity.get('distance', 0) / 1000:.1f} km"),
+            _METRIC_TPL(label="Pace", value=_format_speed_as_pace(activity.get('average_speed'))),
+            _METRIC_TPL(label="Time", value=f"{activity.get('moving_time', 0) / 60:.0f} min"),
+        ])
+        secondary_metrics = "".join([
+            _METRIC_TPL(label="Avg HR", value=f"{avg_hr:.0f} bpm" if avg_hr else "N/A"),
+            _METRIC_TPL(label="Max HR", value=f"{max_hr:.0f} bpm" if max_hr else "N/A"),
+            _METRIC_TPL(label="Cadence", value=f"{avg_cadence:.0f} spm" if avg_cadence else "N/A"),
+            _METRIC_TPL(label="Max Pace", value=_format_speed_as_pace(activity.get('max_speed'))),
+        ])
+
+        elevation = activity.get('total_elevation_gain')
+        details = [
+            f"<b>Type:</b> {html.escape(str(activity.get('type', 'Unknown')))}",
+            f"<b>Elevation:</b> {elevation:.0f} m" if elevation else "<b>Elevation:</b> N/A",
+        ]
+        location_parts = [
+            activity[k] for k in ('location_city', 'location_state', 'location_country') if activity.get(k)
+        ]
+        if location_parts:
+            details.append(f"<b>Location:</b> {html.escape(', '.join(location_parts))}")
+        if activity.get('description'):
+            details.append(f"<b>Description:</b> {html.escape(activity['description'])}")
+        if activity.get('map') and activity['map'].get('summary_polyline'):
+            details.append("<b>Route:</b> Map data available")
+
+        cards.append(
+            f'<details class="activity-card"><summary>🏃 {name} - {formatted_date}</summary>'
+            f'<h3>Key Metrics</h3>'
+            f'<div class="metric-row">{key_metrics}</div>'
+            f'<div class="metrics-center-block metric-row">{secondary_metrics}</div>'
+            f'<hr>{"<br>".join(details)}'
+            f'</details>'
+        )
+    return "".join(cards)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _strava_auth_url():
+    """Strava OAuth authorization URL (None if the backend didn't return one)"""
+    # auth_response = requests.get(f"{API_URL}/auth/strava/authorize", headers=get_headers(), timeout=5)
+    auth_response = _SESSION.get(f"{API_URL}/auth/strava/test/authorize", timeout=_HTTP_TIMEOUT)
+    auth_response.raise_for_status()
+    return _json(auth_response).get("url")
+
+@st.cache_data(ttl=300, show_spinner=False)
+def strava_connected(token) -> bool:
+    """Whether the user's Strava account is linked (cached per token for 5 minutes)"""
+    response = _SESSION.get(f"{API_URL}/auth/strava/connection/status", headers=_bearer(token), timeout=_HTTP_TIMEOUT)
+    return response.status_code == 200 and bool(_json(response).get("connected"))
+
+def _render_strava_connect():
+    """Prompt to connect a Strava account"""
+    st.info("ℹ️ Connect your Strava account to sync your activities")
+    
+    # Show connect button
+    if st.button("🔗 Connect Strava"):
+        try:
+            auth_url = _strava_auth_url()
+            if auth_url:
+                st.markdown(f"[Click here to connect your Strava account]({auth_url})")
+            else:
+                st.error("No authorization URL received")
+        except requests.HTTPError:
+            st.error("Failed to get authorization URL")
+        except Exception as e:
+            st.error(f"Error getting authorization URL: {e}")
+
 def show_strava():
     st.header("Strava Integration")
     
@@ -460,15 +722,15 @@ def show_strava():
     try:
         # FOR TESTING: Use test endpoints without authentication
         # strava_response = requests.get(f"{API_URL}/auth/strava/connection/status", headers=get_headers(), timeout=5)
-        strava_response = requests.get(f"{API_URL}/auth/strava/test/connection/status", timeout=5)
-        if strava_response.status_code == 200 and strava_response.json().get("connected"):
+        strava_response = _SESSION.get(f"{API_URL}/auth/strava/test/connection/status", timeout=_HTTP_TIMEOUT)
+        if strava_response.status_code == 200 and _json(strava_response).get("connected"):
             st.success("✅ Strava connected!")
             
             # Show disconnect button
             if st.button("🔌 Disconnect Strava"):
                 try:
                     # disconnect_response = requests.post(f"{API_URL}/auth/strava/disconnect", headers=get_headers(), timeout=5)
-                    disconnect_response = requests.post(f"{API_URL}/auth/strava/test/disconnect", timeout=5)
+                    disconnect_response = _SESSION.post(f"{API_URL}/auth/strava/test/disconnect", timeout=_HTTP_TIMEOUT)
                     if disconnect_response.status_code == 200:
                         st.success("✅ Strava disconnected!")
                         st.rerun()
@@ -480,10 +742,6 @@ def show_strava():
             # Show recent activities
             st.subheader("Recent Activities")
             
-            # Initialize session state for activities count
-            if 'num_activities' not in st.session_state:
-                st.session_state.num_activities = 10
-            
             # Add controls for number of activities
             col1, col2, col3 = st.columns([1, 1, 2])
             with col1:
@@ -501,193 +759,12 @@ def show_strava():
             
             try:
                 # activities_response = requests.get(f"{API_URL}/auth/strava/activities", headers=get_headers(), params={"limit": st.session_state.num_activities}, timeout=10)
-                activities_response = requests.get(f"{API_URL}/auth/strava/test/activities", params={"limit": st.session_state.num_activities}, timeout=10)
+                activities_response = _SESSION.get(f"{API_URL}/auth/strava/test/activities", params={"limit": st.session_state.num_activities}, timeout=_HTTP_TIMEOUT)
                 if activities_response.status_code == 200:
-                    activities = activities_response.json()
+                    activities = _json(activities_response)
                     if activities:
                         st.write(f"Showing **{len(activities)}** recent activities:")
-                        
-                        for activity in activities:
-                            # Format the date nicely
-                            start_date = activity.get('start_date', '')
-                            formatted_date = "Unknown Date"
-                            if start_date:
-                                try:
-                                    from datetime import datetime
-                                    # Parse ISO date and format it nicely
-                                    date_obj = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                                    formatted_date = date_obj.strftime('%B %d, %Y at %I:%M %p')  # e.g., "January 15, 2024 at 7:00 AM"
-                                except:
-                                    # Fallback to just the date part if parsing fails
-                                    formatted_date = start_date[:10]  # Just show YYYY-MM-DD
-                            
-                            # Display activity in an expander with key metrics
-                            with st.expander(f"🏃 {activity.get('name', 'Unknown Activity')} - {formatted_date}"):
-                                # First row - Most important metrics (larger)
-                                st.markdown("### **Key Metrics**")
-                                col1, col2, col3 = st.columns(3)
-                                
-                                with col1:
-                                    # Distance (convert meters to km)
-                                    distance_m = activity.get('distance', 0)
-                                    distance_km = distance_m / 1000
-                                    st.markdown(f"""
-                                    <div class="metric-container">
-                                        <div class="metric-label">Distance</div>
-                                        <div class="metric-value">{distance_km:.1f} km</div>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                
-                                with col2:
-                                    # Average speed (convert m/s to km/h) and calculate pace
-                                    avg_speed = activity.get('average_speed')
-                                    if avg_speed and avg_speed > 0:
-                                        speed_kmh = avg_speed * 3.6  # m/s to km/h
-                                        pace_min_per_km = 1000 / (avg_speed * 60)  # min/km
-                                        # Convert to minutes:seconds format
-                                        minutes = int(pace_min_per_km)
-                                        seconds = int((pace_min_per_km - minutes) * 60)
-                                        pace_str = f"{minutes}:{seconds:02d} min/km"
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Pace</div>
-                                            <div class="metric-value">{pace_str}</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                    else:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Pace</div>
-                                            <div class="metric-value">N/A</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                
-                                with col3:
-                                    # Moving time (convert seconds to minutes)
-                                    moving_time_s = activity.get('moving_time', 0)
-                                    moving_time_min = moving_time_s / 60
-                                    st.markdown(f"""
-                                    <div class="metric-container">
-                                        <div class="metric-label">Time</div>
-                                        <div class="metric-value">{moving_time_min:.0f} min</div>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-
-                                # Centered block for Avg HR, Max HR, Cadence, Max Speed
-                                st.markdown('<div class="metrics-center-block">', unsafe_allow_html=True)
-                                
-                                # First row: Avg HR, Max HR
-                                col_hr1, col_hr2 = st.columns(2)
-                                with col_hr1:
-                                    avg_hr = activity.get('average_heartrate')
-                                    if avg_hr:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Avg HR</div>
-                                            <div class="metric-value">{avg_hr:.0f} bpm</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                    else:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Avg HR</div>
-                                            <div class="metric-value">N/A</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                with col_hr2:
-                                    max_hr = activity.get('max_heartrate')
-                                    if max_hr:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Max HR</div>
-                                            <div class="metric-value">{max_hr:.0f} bpm</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                    else:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Max HR</div>
-                                            <div class="metric-value">N/A</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                
-                                # Second row: Cadence, Max Speed
-                                col_cad1, col_cad2 = st.columns(2)
-                                with col_cad1:
-                                    avg_cadence = activity.get('average_cadence')
-                                    if avg_cadence:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Cadence</div>
-                                            <div class="metric-value">{avg_cadence:.0f} spm</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                    else:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Cadence</div>
-                                            <div class="metric-value">N/A</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                with col_cad2:
-                                    # Max speed converted to max pace
-                                    max_speed = activity.get('max_speed')
-                                    if max_speed and max_speed > 0:
-                                        # Calculate max pace (same method as average pace)
-                                        max_pace_min_per_km = 1000 / (max_speed * 60)  # min/km
-                                        # Convert to minutes:seconds format
-                                        minutes = int(max_pace_min_per_km)
-                                        seconds = int((max_pace_min_per_km - minutes) * 60)
-                                        max_pace_str = f"{minutes}:{seconds:02d} min/km"
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Max Pace</div>
-                                            <div class="metric-value">{max_pace_str}</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                    else:
-                                        st.markdown(f"""
-                                        <div class="metric-container">
-                                            <div class="metric-label">Max Pace</div>
-                                            <div class="metric-value">N/A</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                
-                                st.markdown('</div>', unsafe_allow_html=True)
-
-                                # Additional info
-                                st.markdown("---")
-                                
-                                # Activity type and elevation
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.write(f"**Type:** {activity.get('type', 'Unknown')}")
-                                with col2:
-                                    elevation = activity.get('total_elevation_gain')
-                                    if elevation:
-                                        st.write(f"**Elevation:** {elevation:.0f} m")
-                                    else:
-                                        st.write("**Elevation:** N/A")
-                                
-                                # Location info if available
-                                location_parts = []
-                                if activity.get('location_city'):
-                                    location_parts.append(activity['location_city'])
-                                if activity.get('location_state'):
-                                    location_parts.append(activity['location_state'])
-                                if activity.get('location_country'):
-                                    location_parts.append(activity['location_country'])
-                                
-                                if location_parts:
-                                    st.write(f"**Location:** {', '.join(location_parts)}")
-                                
-                                # Description if available
-                                if activity.get('description'):
-                                    st.write(f"**Description:** {activity.get('description')}")
-                                
-                                # Route/map info if available
-                                if activity.get('map') and activity['map'].get('summary_polyline'):
-                                    st.write("**Route:** Map data available")
+                        st.markdown(_activities_html(activities_response.content), unsafe_allow_html=True)
                     else:
                         st.info("No recent activities found")
                 else:
@@ -695,47 +772,97 @@ def show_strava():
             except Exception as e:
                 st.error(f"Error loading activities: {e}")
         else:
-            st.info("ℹ️ Connect your Strava account to sync your activities")
-            
-            # Show connect button
-            if st.button("🔗 Connect Strava"):
-                try:
-                    # auth_response = requests.get(f"{API_URL}/auth/strava/authorize", headers=get_headers(), timeout=5)
-                    auth_response = requests.get(f"{API_URL}/auth/strava/test/authorize", timeout=5)
-                    if auth_response.status_code == 200:
-                        auth_url = auth_response.json().get("url")
-                        if auth_url:
-                            st.markdown(f"[Click here to connect your Strava account]({auth_url})")
-                        else:
-                            st.error("No authorization URL received")
-                    else:
-                        st.error("Failed to get authorization URL")
-                except Exception as e:
-                    st.error(f"Error getting authorization URL: {e}")
+            _render_strava_connect()
     except Exception as e:
         st.error(f"Error checking Strava connection: {e}")
-        st.info("ℹ️ Connect your Strava account to sync your activities")
-        
-        # Show connect button
-        if st.button("🔗 Connect Strava"):
-            try:
-                # auth_response = requests.get(f"{API_URL}/auth/strava/authorize", headers=get_headers(), timeout=5)
-                auth_response = requests.get(f"{API_URL}/auth/strava/test/authorize", timeout=5)
-                if auth_response.status_code == 200:
-                    auth_url = auth_response.json().get("url")
-                    if auth_url:
-                        st.markdown(f"[Click here to connect your Strava account]({auth_url})")
-                    else:
-                        st.error("No authorization URL received")
-                else:
-                    st.error("Failed to get authorization URL")
-            except Exception as e:
-                st.error(f"Error getting authorization URL: {e}")
+        _render_strava_connect()
+
+# Sidebar quick questions: (button label, prompt sent to the coach)
+_QUICK_PROMPTS = (
+    ("📊 Analyze my recent training", "Can you analyze my recent running activities and tell me how I'm doing?"),
+    ("🎯 What should I focus on?", "Based on my recent activities, what areas should I focus on improving?"),
+    ("🏃 Pace analysis", "How consistent is my running pace and what does it tell you about my training?"),
+    ("📈 Training trends", "What trends do you see in my training volume and frequency?"),
+    ("💡 Training recommendations", "What specific recommendations do you have for my next week of training?"),
+    ("📋 Review my training plan", "Can you review my current training plan and see how it aligns with my recent activities?"),
+    ("📷 How to photograph plans", "How should I take a photo of my coach's training plan for the best results?"),
+)
 
 def show_coach_chat():
     """Show the coach chat interface - alias for show_chat()"""
     show_chat()
 
+@st.cache_data(ttl=15, show_spinner=False)
+def _ai_health() -> str:
+    """AI backend status: 'active', 'no_data' or 'offline'"""
+    try:
+        test_response = _SESSION.get(f"{API_URL}/ai-coach/quick-insights", timeout=_HTTP_TIMEOUT)
+        if test_response.status_code != 200:
+            return "offline"
+        return "no_data" if "error" in _json(test_response) else "active"
+    except:
+        return "offline"
+
+@st.fragment
+def _render_ai_status():
+    """AI status badge, checked once per page run (the health result is cached for 15s)"""
+    status = _ai_health()
+    if status == "active":
+        st.success("🟢 AI Active")
+    elif status == "no_data":
+        st.warning("🟡 No Data")
+    else:
+        st.error("🔴 AI Offline")
+
+# Opening message of a fresh chat
+_GREETING = {"role": "assistant", "content": "Hi! I'm your AI running coach. I've analyzed your Strava activities and I'm ready to help you improve your training. What would you like to know about your running?"}
+
+def _queue_prompt(prompt):
+    """Button callback: add a quick question to the chat"""
+    st.session_state.messages.append({"role": "user", "content": prompt})
+
+def _clear_chat():
+    """Button callback: reset the chat to the greeting"""
+    st.session_state.messages = [dict(_GREETING)]
+
+@st.fragment
+def _chat_panel():
+    """Chat history and input; sending a message only reruns this fragment"""
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+    
+    # Chat input
+    if prompt := st.chat_input("Ask your AI coach about your training..."):
+        # Add user message to chat history
+        st.session_state.messages.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        
+        # Get AI response
+        with st.chat_message("assistant"):
+            with st.spinner("Analyzing your data..."):
+                try:
+                    response = _SESSION.post(
+                        f"{API_URL}/chat/message",
+                        json={"message": prompt},
+                        timeout=_HTTP_TIMEOUT
+                    )
+                    if response.status_code == 200:
+                        ai_response = response.json()["message"]
+                        st.markdown(ai_response)
+                        # Add AI response to chat history
+                        st.session_state.messages.append({"role": "assistant", "content": ai_response})
+                    else:
+                        error_detail = response.json().get("detail", "Unknown error")
+                        error_msg = f"I'm having trouble right now. Error: {error_detail}"
+                        st.error(error_msg)
+                        st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                except Exception as e:
+                    error_msg = f"I'm having trouble connecting. Please make sure the backend is running. Error: {str(e)}"
+                    st.error(error_msg)
+                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+
 def show_chat():
     st.header("🤖 AI Running Coach Chat")
     
@@ -745,29 +872,11 @@ def show_chat():
         st.info("💬 **Chat with your AI coach!** I can analyze your Strava data and provide personalized training advice.")
     with col2:
         # Check if AI is configured
-        try:
-            test_response = requests.get(f"{API_URL}/ai-coach/quick-insights", timeout=5)
-            if test_response.status_code == 200:
-                data = test_response.json()
-                if "error" not in data:
-                    st.success("🟢 AI Active")
-                else:
-                    st.warning("🟡 No Data")
-            else:
-                st.error("🔴 AI Offline")
-        except:
-            st.error("🔴 AI Offline")
+        _render_ai_status()
     
     # Initialize chat history
     if "messages" not in st.session_state:
-        st.session_state.messages = [
-            {"role": "assistant", "content": "Hi! I'm your AI running coach. I've analyzed your Strava activities and I'm ready to help you improve your training. What would you like to know about your running?"}
-        ]
-    
-    # Display chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+        st.session_state.messages = [dict(_GREETING)]
     
     # Plan Photo Upload Section
     st.subheader("📷 Upload Training Plan Photo")
@@ -789,119 +898,73 @@ def show_chat():
         if uploaded_file and (parse_only or parse_and_save):
             with st.spinner("🤖 Reading your training plan..."):
                 try:
-                    # Prepare the file for upload
-                    files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+                    # Hand requests the file object itself so it streams it instead of copying the bytes
+                    uploaded_file.seek(0)
+                    files = {"file": (uploaded_file.name, uploaded_file, uploaded_file.type)}
                     
                     # Send the request to the correct endpoint
-                    response = requests.post(
+                    response = _SESSION.post(
                         f"{API_URL}/plan-parser/upload-image",
                         files=files,
-                        params={"user_id": 1}
+                        params={"user_id": 1},
+                        timeout=_UPLOAD_TIMEOUT
                     )
                     print(f"Debug: Upload response status: {response.status_code}")
-                    print(f"Debug: Upload response text: {response.text}")
+                    print(f"Debug: Upload response text: {response.text[:ERROR_BODY_LIMIT]}")
                     
                     if response.status_code == 200:
                         result = response.json()
                         st.success("✅ Plan parsed successfully!")
+                        # The upload also stores the plan's workouts
+                        _invalidate_trainings()
                         # Store the result in session state and redirect
                         st.session_state.parsed_plan = result
                         st.session_state.active_page = "Training Plan"
                         st.rerun()
                     else:
-                        st.error(f"Error processing image: {response.text}")
+                        st.error(f"Error processing image: {response.text[:ERROR_BODY_LIMIT]}")
                 except Exception as e:
                     st.error(f"Error processing image: {str(e)}")
                     print(f"Debug: Upload error: {str(e)}")
     
-    # Chat input
-    if prompt := st.chat_input("Ask your AI coach about your training..."):
-        # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
-        
-        # Get AI response
-        with st.chat_message("assistant"):
-            with st.spinner("Analyzing your data..."):
-                try:
-                    response = requests.post(
-                        f"{API_URL}/chat/message",
-                        json={"message": prompt},
-                        timeout=15
-                    )
-                    if response.status_code == 200:
-                        ai_response = response.json()["message"]
-                        st.markdown(ai_response)
-                        # Add AI response to chat history
-                        st.session_state.messages.append({"role": "assistant", "content": ai_response})
-                    else:
-                        error_detail = response.json().get("detail", "Unknown error")
-                        error_msg = f"I'm having trouble right now. Error: {error_detail}"
-                        st.error(error_msg)
-                        st.session_state.messages.append({"role": "assistant", "content": error_msg})
-                except Exception as e:
-                    error_msg = f"I'm having trouble connecting. Please make sure the backend is running. Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+    # Display chat messages and handle input
+    _chat_panel()
     
     # Enhanced Quick Prompts
     st.sidebar.markdown("### 🚀 Quick Questions")
     
-    if st.sidebar.button("📊 Analyze my recent training"):
-        prompt = "Can you analyze my recent running activities and tell me how I'm doing?"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
-    
-    if st.sidebar.button("🎯 What should I focus on?"):
-        prompt = "Based on my recent activities, what areas should I focus on improving?"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
-    
-    if st.sidebar.button("🏃 Pace analysis"):
-        prompt = "How consistent is my running pace and what does it tell you about my training?"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
-    
-    if st.sidebar.button("📈 Training trends"):
-        prompt = "What trends do you see in my training volume and frequency?"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
-    
-    if st.sidebar.button("💡 Training recommendations"):
-        prompt = "What specific recommendations do you have for my next week of training?"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
-    
-    if st.sidebar.button("📋 Review my training plan"):
-        prompt = "Can you review my current training plan and see how it aligns with my recent activities?"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
-    
-    if st.sidebar.button("📷 How to photograph plans"):
-        prompt = "How should I take a photo of my coach's training plan for the best results?"
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
+    # Callbacks run before the rerun the click already triggers, so no extra st.rerun()
+    for i, (label, prompt) in enumerate(_QUICK_PROMPTS):
+        st.sidebar.button(label, key=f"quick_prompt_{i}", on_click=_queue_prompt, args=(prompt,))
     
     # Clear chat option
-    if st.sidebar.button("🗑️ Clear Chat"):
-        st.session_state.messages = [
-            {"role": "assistant", "content": "Hi! I'm your AI running coach. I've analyzed your Strava activities and I'm ready to help you improve your training. What would you like to know about your running?"}
-        ]
-        st.rerun()
+    st.sidebar.button("🗑️ Clear Chat", on_click=_clear_chat)
+
+@st.cache_data(show_spinner=False)
+def _activity_options(activities: list) -> dict:
+    """Selectbox labels mapped to their activities"""
+    activity_options = {}
+    for activity in activities:
+        date_str = activity['start_date'][:10] if 'start_date' in activity else "Unknown date"
+        label = f"{activity['name']} - {date_str} ({activity['distance_km']:.2f} km)"
+        activity_options[label] = activity
+    return activity_options
 
 def show_workout_context():
     st.header("💪 Enhanced Workout Context")
     st.info("Add detailed context to your Strava activities for better AI coaching insights!")
     
+    token = st.session_state.get('token')
+    
+    # Analytics don't depend on the selected activity, so they load while the activities do
+    analytics_future = _start_interval_analytics(token)
+    
     # Get user's recent activities
     try:
-        activities_response = requests.get(f"{API_URL}/strava/activities?limit=20", timeout=5)
-        if activities_response.status_code == 200:
-            activities = activities_response.json()
-        else:
-            st.error("Failed to load activities")
-            return
+        activities = _fetch_activities(20, token)
+    except requests.HTTPError:
+        st.error("Failed to load activities")
+        return
     except:
         st.error("Cannot connect to backend")
         return
@@ -913,11 +976,7 @@ def show_workout_context():
     # Activity selection
     st.subheader("📋 Select Activity to Enhance")
     
-    activity_options = {}
-    for activity in activities:
-        date_str = activity['start_date'][:10] if 'start_date' in activity else "Unknown date"
-        label = f"{activity['name']} - {date_str} ({activity['distance_km']:.2f} km)"
-        activity_options[label] = activity
+    activity_options = _activity_options(activities)
     
     selected_label = st.selectbox("Choose an activity:", list(activity_options.keys()))
     selected_activity = activity_options[selected_label]
@@ -925,9 +984,7 @@ def show_workout_context():
     # Check if context already exists
     existing_context = None
     try:
-        context_response = requests.get(f"{API_URL}/workout-context/{selected_activity['strava_id']}", timeout=5)
-        if context_response.status_code == 200:
-            existing_context = context_response.json()
+        existing_context = _fetch_workout_context(selected_activity['strava_id'], token)
     except:
         pass  # No existing context
     
@@ -985,27 +1042,27 @@ def show_workout_context():
         if workout_type in ["Intervals", "Track Workout", "Fartlek"]:
             st.subheader("⏱️ Interval Details")
             
-            # Number of intervals
-            num_intervals = st.number_input("Number of intervals", min_value=1, max_value=20, value=5)
-            
-            intervals_data = []
-            for i in range(num_intervals):
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    distance = st.text_input(f"Rep {i+1} Distance", value="400m", key=f"dist_{i}")
-                with col2:
-                    time = st.text_input(f"Rep {i+1} Time", value="1:30", key=f"time_{i}")
-                with col3:
-                    rest = st.text_input(f"Rep {i+1} Rest", value="90s", key=f"rest_{i}")
-                with col4:
-                    hr_avg = st.number_input(f"Rep {i+1} HR", min_value=100, max_value=220, value=180, key=f"hr_{i}")
-                
-                intervals_data.append({
-                    "distance": distance,
-                    "time": time,
-                    "rest": rest,
-                    "hr_avg": hr_avg
-                })
+            # One editable grid for all reps (add/remove rows as needed)
+            num_intervals = 5
+            intervals_df = st.data_editor(
+                pd.DataFrame({
+                    "distance": ["400m"] * num_intervals,
+                    "time": ["1:30"] * num_intervals,
+                    "rest": ["90s"] * num_intervals,
+                    "hr_avg": [180] * num_intervals
+                }),
+                num_rows="dynamic",
+                key="intervals_editor",
+                column_config={
+                    "distance": "Distance",
+                    "time": "Time",
+                    "rest": "Rest",
+                    "hr_avg": st.column_config.NumberColumn("HR", min_value=100, max_value=220, step=1)
+                }
+            )
+            # Empty cells come back as NaN, which isn't valid JSON; send them as null
+            intervals_df = intervals_df.dropna(how="all").astype(object)
+            intervals_data = intervals_df.where(intervals_df.notna(), None).to_dict(orient="records")
         
         # Performance metrics
         st.subheader("📊 Performance Metrics")
@@ -1129,55 +1186,58 @@ def show_workout_context():
         submitted = st.form_submit_button("💾 Save Enhanced Context", type="primary")
         
         if submitted:
-            # Prepare data for API
-            context_data = {
-                "strava_activity_id": selected_activity['strava_id'],
-                "workout_type": workout_type,
-                "terrain": terrain,
-                "weather": weather,
-                "temperature": temperature,
-                "avg_hr_work_intervals": avg_hr_work,
-                "max_hr_session": max_hr,
-                "lactate_measurement": lactate if lactate > 0 else None,
-                "rpe_work_intervals": rpe_work,
-                "rpe_overall": rpe_overall,
-                "target_pace": target_pace if target_pace else None,
-                "energy_level_pre": energy_pre,
-                "energy_level_post": energy_post,
-                "motivation": motivation,
-                "sleep_quality_previous_night": sleep_quality,
-                "soreness_pre": soreness_pre,
-                "soreness_post": soreness_post,
-                "goal_achieved": goal_achieved,
-                "workout_description": workout_description if workout_description else None,
-                "how_it_felt": how_it_felt if how_it_felt else None,
-                "coaching_notes": coaching_notes if coaching_notes else None
-            }
+            # Prepare data for API, leaving out unset values in the same pass
+            fields = [
+                ("strava_activity_id", selected_activity['strava_id']),
+                ("workout_type", workout_type),
+                ("terrain", terrain),
+                ("weather", weather),
+                ("temperature", temperature),
+                ("avg_hr_work_intervals", avg_hr_work),
+                ("max_hr_session", max_hr),
+                ("lactate_measurement", lactate if lactate > 0 else None),
+                ("rpe_work_intervals", rpe_work),
+                ("rpe_overall", rpe_overall),
+                ("target_pace", target_pace if target_pace else None),
+                ("energy_level_pre", energy_pre),
+                ("energy_level_post", energy_post),
+                ("motivation", motivation),
+                ("sleep_quality_previous_night", sleep_quality),
+                ("soreness_pre", soreness_pre),
+                ("soreness_post", soreness_post),
+                ("goal_achieved", goal_achieved),
+                ("workout_description", workout_description if workout_description else None),
+                ("how_it_felt", how_it_felt if how_it_felt else None),
+                ("coaching_notes", coaching_notes if coaching_notes else None),
+            ]
             
             # Add intervals data if applicable
             if workout_type in ["Intervals", "Track Workout", "Fartlek"]:
-                context_data["intervals_data"] = json.dumps(intervals_data)
+                fields.append(("intervals_data", intervals_data))
             
-            # Remove None values
-            context_data = {k: v for k, v in context_data.items() if v is not None}
+            context_data = {k: v for k, v in fields if v is not None}
             
             try:
-                response = requests.post(f"{API_URL}/workout-context/", json=context_data, timeout=10)
+                response = _SESSION.post(f"{API_URL}/workout-context/", json=context_data, timeout=_HTTP_TIMEOUT)
                 if response.status_code == 200:
+                    # Drop cached copies so the saved values show up straight away
+                    _fetch_workout_context.clear()
+                    # The analytics started on entry predate this save
+                    analytics_future = _start_interval_analytics(token)
                     st.success("✅ Enhanced context saved successfully!")
                     st.info("Your AI coach will now have much better insights into this workout!")
                 else:
-                    st.error(f"Failed to save context: {response.text}")
+                    st.error(f"Failed to save context: {response.text[:ERROR_BODY_LIMIT]}")
             except Exception as e:
                 st.error(f"Error saving context: {str(e)}")
     
     # Show interval analytics if available
     st.subheader("📈 Your Interval Training Analytics")
     try:
-        analytics_response = requests.get(f"{API_URL}/workout-context/analytics/intervals", timeout=5)
-        if analytics_response.status_code == 200:
-            analytics = analytics_response.json()
-            
+        response = analytics_future.result()
+        response.raise_for_status()
+        analytics = _json(response)
+        if analytics:
             if analytics['total_interval_sessions'] > 0:
                 col1, col2, col3 = st.columns(3)
                 with col1:
@@ -1196,6 +1256,60 @@ def show_workout_context():
     except:
         pass
 
+# Coach prompts used on the training plan page
+_ANALYZE_PLAN_PROMPT = "Please analyze this training plan and provide specific feedback on the structure, intensity distribution, and any recommendations for improvements. Plan data: {plan_data}"
+_MODIFY_PLAN_PROMPT = "Based on my current training plan and recent Strava activities, what specific modifications would you recommend? Please be specific about which workouts to change and why."
+_COMPARE_PLAN_PROMPT = "Compare my training plan workouts with my actual Strava activities. How well am I following the plan and what adjustments should I make?"
+
+def _plan_payload(plan_title, plan_workouts):
+    """Plan data sent to the coach, without frontend-only fields like _dt"""
+    return {
+        "plan_title": plan_title,
+        "workouts": [{k: v for k, v in w.items() if k != '_dt'} for w in plan_workouts]
+    }
+
+def stream_chat(message, budget=8.0, retries=2):
+    """Yield the coach's reply as it is generated.
+
+    LLM latency has a long tail, so a request whose response headers don't arrive
+    within `budget` seconds is abandoned and re-sent with 1.5x the budget, up to
+    `retries` times. Only that wait is retried: once the reply is streaming, chunks
+    may be up to _STREAM_READ_TIMEOUT apart, and a longer stall raises.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = _SESSION.post(
+                f"{API_URL}/ai-coach/chat/stream",
+                json={"message": message},
+                params={"user_id": 1},
+                stream=True,
+                timeout=(_HTTP_TIMEOUT[0], budget)
+            )
+            break
+        except requests.Timeout:
+            if attempt == retries:
+                raise
+            budget *= 1.5
+    with response:
+        response.raise_for_status()
+        # The budget was the socket's read timeout; the body gets its own, longer one
+        sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+        if sock is not None:
+            sock.settimeout(_STREAM_READ_TIMEOUT)
+        yield from response.iter_content(chunk_size=None, decode_unicode=True)
+
+def chat_batch(messages):
+    """Send several independent messages to the coach in one request; replies come back in order"""
+    response = _SESSION.post(
+        f"{API_URL}/ai-coach/chat/batch",
+        json={"messages": messages},
+        params={"user_id": 1},
+        # The server runs one completion per message before answering
+        timeout=(_HTTP_TIMEOUT[0], _STREAM_READ_TIMEOUT)
+    )
+    response.raise_for_status()
+    return _json(response)["messages"]
+
 def show_training_plan():
     st.header("Training Plan")
     
@@ -1213,20 +1327,14 @@ def show_training_plan():
         for week in plan["weekly_structure"]:
             st.markdown(f"### Week {week['week_number']} - Total Distance: {week['total_distance']:.1f} km")
             
-            # Create a DataFrame for the table
-            table_data = {
-                "Day": [],
-                "Workout": [],
-                "Distance (km)": []
-            }
-            
-            for workout in week["workouts"]:
-                table_data["Day"].append(workout["day"])
-                table_data["Workout"].append(workout["description"])
-                table_data["Distance (km)"].append(f"{workout['distance']:.1f}")
+            # Build the table in one go and let the Styler format the distances
+            table = pd.DataFrame.from_records(
+                [(w["day"], w["description"], w["distance"]) for w in week["workouts"]],
+                columns=["Day", "Workout", "Distance (km)"]
+            )
             
             # Display as a table
-            st.table(pd.DataFrame(table_data))
+            st.table(table.style.format({"Distance (km)": "{:.1f}"}))
             st.markdown("---")
         
         # Clear the parsed plan from session state
@@ -1235,17 +1343,24 @@ def show_training_plan():
     
     # Fetch actual training data from the database
     try:
-        response = requests.get(f"{API_URL}/training?user_id=1", timeout=10)
-        if response.status_code == 200:
-            trainings = response.json()
-            # Filter for planned/coach-generated workouts
-            plan_workouts = [t for t in trainings if t.get('plan_source') in ['coach_photo', 'ai_generated']]
-        else:
-            plan_workouts = []
+        trainings = _fetch_trainings(1, st.session_state.get('token'))
+        # Filter for planned/coach-generated workouts
+        plan_workouts = [t for t in trainings if t.get('plan_source') in PLAN_SOURCES]
+    except requests.HTTPError:
+        plan_workouts = []
     except Exception as e:
         st.error(f"Error loading training plan: {str(e)}")
         plan_workouts = []
     
+    # Parse each date once; the grouping, sorting, labels and export all reuse it
+    for w in plan_workouts:
+        w['_dt'] = datetime.fromisoformat(w['date'])
+    
+    # Trainings are cached for a minute; let the user force a reload
+    if st.button("🔄 Refresh", key="training_plan_refresh"):
+        _invalidate_trainings()
+        st.rerun()
+    
     if not plan_workouts:
         # No plan uploaded yet
         st.info("🚀 **No training plan loaded yet!**")
@@ -1259,9 +1374,10 @@ def show_training_plan():
             if st.button("🤖 Generate AI Plan", type="secondary", key="training_plan_generate_ai"):
                 with st.spinner("Generating personalized training plan..."):
                     try:
-                        generate_response = requests.post(f"{API_URL}/ai-coach/generate-plan", 
-                                                        json={"user_id": 1, "weeks": 4}, timeout=30)
+                        generate_response = _SESSION.post(f"{API_URL}/ai-coach/generate-plan", 
+                                                        json={"user_id": 1, "weeks": 4}, timeout=_HTTP_TIMEOUT)
                         if generate_response.status_code == 200:
+                            _invalidate_trainings()
                             st.success("✅ AI training plan generated!")
                             st.rerun()
                         else:
@@ -1285,124 +1401,104 @@ def show_training_plan():
         st.metric("Source", f"{source_emoji} {plan_source.replace('_', ' ').title()}")
     with col3:
         # Calculate date range
-        dates = [datetime.fromisoformat(t['date']) for t in plan_workouts]
-        if dates:
-            duration_days = (max(dates) - min(dates)).days
+        dates = pd.to_datetime([t['date'] for t in plan_workouts], format='ISO8601')
+        if len(dates):
+            duration_days = (dates.max() - dates.min()).days
             duration_weeks = duration_days // 7 + 1
             st.metric("Duration", f"{duration_weeks} weeks")
     
     # AI Analysis & Recommendations
     st.subheader("🤖 AI Plan Analysis")
     
+    # AI replies for this plan live under one session-state namespace
+    ai = st.session_state.setdefault("ai", {"analysis": None, "mods": None, "cmp": None})
+    
     # Get AI analysis of the current plan
-    col1, col2 = st.columns([2, 1])
+    col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
         if st.button("🔍 Analyze Plan with AI", type="secondary", key="training_plan_analyze_ai"):
-            with st.spinner("AI analyzing your training plan..."):
-                try:
-                    # Fetch the parsed plan data
-                    plan_response = requests.get(f"{API_URL}/training?user_id=1", timeout=10)
-                    if plan_response.status_code == 200:
-                        plan_workouts = plan_response.json()
-                        # Filter for planned/coach-generated workouts
-                        plan_workouts = [t for t in plan_workouts if t.get('plan_source') in ['coach_photo', 'ai_generated']]
-                        
-                        # Prepare the plan data for analysis
-                        plan_data = {
-                            "plan_title": plan_workouts[0].get('plan_title', 'Training Plan'),
-                            "workouts": plan_workouts
-                        }
-                        
-                        # Send the plan data for analysis
-                        analysis_response = requests.post(
-                            f"{API_URL}/chat/message",
-                            json={"message": f"Please analyze this training plan and provide specific feedback on the structure, intensity distribution, and any recommendations for improvements. Plan data: {plan_data}"},
-                            timeout=20
-                        )
-                        if analysis_response.status_code == 200:
-                            analysis = analysis_response.json()["message"]
-                            st.session_state.plan_analysis = analysis
-                            st.rerun()
-                        else:
-                            st.error("Failed to get AI analysis")
-                    else:
-                        st.error("Failed to fetch plan data")
-                except Exception as e:
-                    st.error(f"Error getting analysis: {e}")
+            try:
+                # Prepare the plan data for analysis (plan_workouts was loaded above)
+                plan_data = _plan_payload(plan_title, plan_workouts)
+                
+                # Show the analysis as it streams in, then hand it to the expander below
+                with st.empty():
+                    ai["analysis"] = st.write_stream(stream_chat(_ANALYZE_PLAN_PROMPT.format(plan_data=plan_data)))
+                    st.empty()
+            except requests.HTTPError:
+                st.error("Failed to get AI analysis")
+            except Exception as e:
+                st.error(f"Error getting analysis: {e}")
     
     with col2:
         if st.button("💡 Get Modifications", type="primary", key="training_plan_get_modifications"):
-            with st.spinner("AI suggesting plan modifications..."):
+            try:
+                with st.empty():
+                    ai["mods"] = st.write_stream(stream_chat(_MODIFY_PLAN_PROMPT))
+                    st.empty()
+            except requests.HTTPError:
+                st.error("Failed to get modifications")
+            except Exception as e:
+                st.error(f"Error getting modifications: {e}")
+    
+    with col3:
+        if st.button("🤖 Full AI Review", key="training_plan_full_review"):
+            with st.spinner("AI reviewing your plan..."):
+                plan_data = _plan_payload(plan_title, plan_workouts)
                 try:
-                    mod_response = requests.post(
-                        f"{API_URL}/chat/message",
-                        json={"message": "Based on my current training plan and recent Strava activities, what specific modifications would you recommend? Please be specific about which workouts to change and why."},
-                        timeout=20
-                    )
-                    if mod_response.status_code == 200:
-                        modifications = mod_response.json()["message"]
-                        st.session_state.plan_modifications = modifications
-                        st.rerun()
-                    else:
-                        st.error("Failed to get modifications")
+                    results = chat_batch([
+                        _ANALYZE_PLAN_PROMPT.format(plan_data=plan_data),
+                        _MODIFY_PLAN_PROMPT,
+                        _COMPARE_PLAN_PROMPT,
+                    ])
+                    ai["analysis"], ai["mods"], ai["cmp"] = results
                 except Exception as e:
-                    st.error(f"Error getting modifications: {e}")
+                    st.error(f"Error getting AI review: {e}")
     
     # Show AI analysis if available
-    if "plan_analysis" in st.session_state:
+    if ai["analysis"]:
         with st.expander("📊 **AI Plan Analysis**", expanded=True):
-            st.write(st.session_state.plan_analysis)
+            st.write(ai["analysis"])
+    
+    # Show plan vs actual comparison if available
+    if ai["cmp"]:
+        with st.expander("📈 **Plan vs Actual Analysis**", expanded=True):
+            st.write(ai["cmp"])
     
     # Show AI modifications if available
-    if "plan_modifications" in st.session_state:
+    if ai["mods"]:
         with st.expander("💡 **AI Recommended Modifications**", expanded=True):
-            st.write(st.session_state.plan_modifications)
+            st.write(ai["mods"])
             
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("✅ Apply Suggestions", type="primary", key="training_plan_apply_suggestions"):
                     st.info("Feature coming soon: Automatic plan modifications based on AI suggestions!")
             with col2:
-                if st.button("🔄 Get New Suggestions", key="training_plan_new_suggestions"):
-                    del st.session_state.plan_modifications
-                    st.rerun()
+                # Clearing in a callback happens before the click's own rerun, so no st.rerun() needed
+                st.button("🔄 Get New Suggestions", key="training_plan_new_suggestions",
+                          on_click=ai.__setitem__, args=("mods", None))
     
     # Training Schedule by Week
     st.subheader("📅 Weekly Training Schedule")
     
-    # Group workouts by week
+    # Group workouts by week (the backend guarantees one workout per day, type and source)
+    start_date = min(w['_dt'] for w in plan_workouts)
     workouts_by_week = {}
-    for workout in plan_workouts:
-        workout_date = datetime.fromisoformat(workout['date'])
+    for workout in sorted(plan_workouts, key=lambda w: w['_dt']):
         # Calculate week number from start of plan
-        start_date = min(datetime.fromisoformat(t['date']) for t in plan_workouts)
-        week_num = ((workout_date - start_date).days // 7) + 1
-        
-        if week_num not in workouts_by_week:
-            workouts_by_week[week_num] = {}
-        
-        # Create a unique key for each workout based on date and type
-        workout_key = f"{workout_date.strftime('%Y-%m-%d')}_{workout.get('type', '')}"
-        
-        # If we already have a workout for this day and type, keep the one with more details
-        if workout_key in workouts_by_week[week_num]:
-            existing = workouts_by_week[week_num][workout_key]
-            # Keep the workout with the longer description or more details
-            if len(workout.get('description', '')) > len(existing.get('description', '')):
-                workouts_by_week[week_num][workout_key] = workout
-        else:
-            workouts_by_week[week_num][workout_key] = workout
+        week_num = ((workout['_dt'] - start_date).days // 7) + 1
+        workouts_by_week.setdefault(week_num, []).append(workout)
     
     # Display each week
-    for week_num in sorted(workouts_by_week.keys()):
-        # Convert dictionary values to list and sort by date
-        week_workouts = sorted(workouts_by_week[week_num].values(), key=lambda x: x['date'])
-        
+    for week_num, week_workouts in workouts_by_week.items():
         with st.expander(f"📊 **Week {week_num}** ({len(week_workouts)} workouts)", expanded=week_num <= 2):
             # Week statistics
-            distances = [w.get('distance', 0) or 0 for w in week_workouts]
-            total_distance = sum(distances)
-            workout_types = [w.get('type', 'unknown') for w in week_workouts]
+            total_distance = 0.0
+            workout_types = set()
+            for w in week_workouts:
+                total_distance += w.get('distance', 0) or 0
+                workout_types.add(w.get('type', 'unknown'))
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -1410,34 +1506,21 @@ def show_training_plan():
             with col2:
                 st.metric("Workouts", len(week_workouts))
             with col3:
-                intensity_mix = len(set(workout_types))
+                intensity_mix = len(workout_types)
                 st.metric("Variety", f"{intensity_mix} types")
             
             # Daily schedule
             st.write("**Daily Schedule:**")
-            for workout in week_workouts:
-                workout_date = datetime.fromisoformat(workout['date'])
-                day_name = workout_date.strftime('%A')
-                
-                col1, col2, col3, col4 = st.columns([1, 2, 2, 1])
-                with col1:
-                    st.write(f"**{day_name}**")
-                with col2:
-                    workout_type = workout.get('type', 'unknown').replace('_', ' ').title()
-                    type_emoji = {
-                        'Easy Run': '🏃', 'Long Run': '🏃‍♂️', 'Intervals': '⚡', 
-                        'Tempo': '🔥', 'Hills': '⛰️', 'Recovery': '😌', 'Rest': '😴'
-                    }.get(workout_type, '🏃')
-                    st.write(f"{type_emoji} {workout_type}")
-                with col3:
-                    description = workout.get('description', 'No description')
-                    st.write(description)
-                with col4:
-                    distance = workout.get('distance')
-                    if distance:
-                        st.write(f"{distance:.1f}km")
-                    else:
-                        st.write("-")
+            # One dataframe per week instead of a row of widgets per workout
+            week_df = pd.DataFrame.from_records(week_workouts).reindex(columns=['_dt', 'type', 'description', 'distance'])
+            type_labels = week_df['type'].fillna('unknown').str.replace('_', ' ').str.title()
+            schedule = pd.DataFrame({
+                "Day": pd.to_datetime(week_df['_dt']).dt.day_name(),
+                "Type": type_labels.map(TYPE_EMOJI).fillna('🏃') + ' ' + type_labels,
+                "Description": week_df['description'].fillna('No description'),
+                "Distance": week_df['distance'].map(lambda d: f"{d:.1f}km" if pd.notna(d) and d else "-"),
+            })
+            st.dataframe(schedule, hide_index=True, use_container_width=True)
     
     # Plan Management
     st.subheader("⚙️ Plan Management")
@@ -1452,37 +1535,42 @@ def show_training_plan():
         if st.button("🗑️ Clear Current Plan", type="secondary", key="training_plan_clear"):
             if st.session_state.get("confirm_clear", False):
                 try:
-                    delete_response = requests.delete(
+                    delete_response = _SESSION.delete(
                         f"{API_URL}/training/clear-plan",
                         params={"user_id": 1},
-                        timeout=10
+                        timeout=_HTTP_TIMEOUT
                     )
                     if delete_response.status_code == 200:
+                        _invalidate_trainings()
                         st.success("✅ Training plan cleared!")
                         st.session_state.confirm_clear = False
+                        # The plan above was already drawn from the old data
                         st.rerun()
                     else:
-                        st.error(f"Failed to clear plan: {delete_response.text}")
+                        st.error(f"Failed to clear plan: {delete_response.text[:ERROR_BODY_LIMIT]}")
                 except Exception as e:
                     st.error(f"Error clearing plan: {e}")
             else:
                 st.session_state.confirm_clear = True
                 st.warning("⚠️ Click again to confirm deletion of current plan")
-                st.rerun()
     
     with col3:
         if st.button("📤 Export Plan", key="training_plan_export"):
-            import io
-            output = io.StringIO()
-            output.write("Date,Day,Type,Description,Distance (km),Intensity\n")
-            for workout in sorted(plan_workouts, key=lambda x: x['date']):
-                date = workout['date']
-                day = datetime.fromisoformat(date).strftime('%A')
-                workout_type = workout.get('type', '').replace('_', ' ').title()
-                description = workout.get('description', '').replace(',', ';')
-                distance = workout.get('distance', 0) or 0
-                intensity = workout.get('intensity', '')
-                output.write(f"{date},{day},{workout_type},{description},{distance},{intensity}\n")
+            # csv.writer handles quoting of commas/newlines in descriptions
+            output = StringIO()
+            writer = csv.writer(output)
+            writer.writerow(["Date", "Day", "Type", "Description", "Distance (km)", "Intensity"])
+            writer.writerows(
+                (
+                    workout['date'],
+                    workout['_dt'].strftime('%A'),
+                    workout.get('type', '').replace('_', ' ').title(),
+                    workout.get('description', ''),
+                    workout.get('distance', 0) or 0,
+                    workout.get('intensity', '')
+                )
+                for workout in sorted(plan_workouts, key=lambda x: x['_dt'])
+            )
             
             st.download_button(
                 label="💾 Download as CSV",
@@ -1495,31 +1583,18 @@ def show_training_plan():
     st.subheader("🔗 Integration Status")
     
     try:
-        # Get authentication headers
-        headers = {
-            "Authorization": f"Bearer {st.session_state['access_token']}",
-            "Content-Type": "application/json"
-        }
-        
         # Check Strava connection
-        strava_response = requests.get(f"{API_URL}/auth/strava/connection/status", headers=headers, timeout=5)
-        if strava_response.status_code == 200 and strava_response.json().get("connected"):
+        if strava_connected(st.session_state.get('token')):
             st.success("✅ Strava connected - Plan workouts can be compared with actual activities")
             
             if st.button("📊 Compare Plan vs Actual Performance", key="training_plan_compare_strava"):
-                with st.spinner("Analyzing plan adherence..."):
-                    try:
-                        comparison_response = requests.post(
-                            f"{API_URL}/chat/message",
-                            json={"message": "Compare my training plan workouts with my actual Strava activities. How well am I following the plan and what adjustments should I make?"},
-                            timeout=20
-                        )
-                        if comparison_response.status_code == 200:
-                            comparison = comparison_response.json()["message"]
-                            st.info("📈 **Plan vs Actual Analysis:**")
-                            st.write(comparison)
-                    except Exception as e:
-                        st.error(f"Error getting comparison: {e}")
+                st.info("📈 **Plan vs Actual Analysis:**")
+                try:
+                    st.write_stream(stream_chat(_COMPARE_PLAN_PROMPT))
+                except requests.HTTPError:
+                    st.error("Failed to get comparison")
+                except Exception as e:
+                    st.error(f"Error getting comparison: {e}")
         else:
             st.info("ℹ️ Connect Strava to compare planned vs actual workouts")
             if st.button("🔗 Connect Strava", key="training_plan_connect_strava"):
@@ -1556,25 +1631,23 @@ def show_dashboard():
     """Show main dashboard with overview of training plan and recent activities."""
     st.header("🏠 Dashboard")
     
-    # Load profile and training data
-    load_profile_data()
-    load_training_plan()
-    
     # Quick overview section
     st.subheader("📊 Quick Overview")
     
     # Initialize variables
     plan_workouts = []
     recent_trainings = []
-    response = None
     
-    # Fetch recent training data
+    # Fetch profile, trainings and Strava status in one request
     try:
-        response = requests.get(f"{API_URL}/training?user_id=1", timeout=10)
-        if response.status_code == 200:
-            trainings = response.json()
-            recent_trainings = [t for t in trainings if t.get('plan_source') not in ['coach_photo', 'ai_generated']]
-            plan_workouts = [t for t in trainings if t.get('plan_source') in ['coach_photo', 'ai_generated']]
+        try:
+            dashboard = _dashboard(st.session_state.get('token'))
+        except requests.HTTPError:
+            dashboard = None
+        if dashboard is not None:
+            plan_workouts, recent_trainings = dashboard["plan"], dashboard["recent"]
+            if dashboard.get("profile"):
+                st.session_state.profile_data = dashboard["profile"]
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -1614,7 +1687,7 @@ def show_dashboard():
     # Recent activities preview
     st.subheader("📈 Recent Activities")
     try:
-        if response.status_code == 200 and recent_trainings:
+        if recent_trainings:
             recent_activities = recent_trainings[-5:]  # Show last 5 activities
             for activity in reversed(recent_activities):
                 with st.expander(f"{activity['date']} - {activity.get('type', 'Activity')}", expanded=False):
@@ -1,8 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import user, metrics, training, plan, chat, strava, ai_coach, workout_context, plan_parser, auth
+from app.api import user, metrics, training, plan, chat, strava, ai_coach, workout_context, plan_parser, auth, dashboard
 from app.config import settings
-from app.database import init_db, recreate_tables
+from sqlmodel import Session
+from app.database import engine, init_db, recreate_tables
+from app.crud.training import add_training_unique_index
+from app.crud.workout_context import add_workout_context_indexes, migrate_scale_columns
 
 # Import all models to ensure tables are created
 from app.models import user as user_models, metrics as metrics_models, training as training_models, strava as strava_models
@@ -34,10 +37,15 @@ app.include_router(strava.router, prefix=settings.API_V1_PREFIX + "/auth/strava"
 app.include_router(ai_coach.router, prefix=settings.API_V1_PREFIX)
 app.include_router(workout_context.router, prefix=settings.API_V1_PREFIX)
 app.include_router(plan_parser.router, prefix=settings.API_V1_PREFIX)
+app.include_router(dashboard.router, prefix=settings.API_V1_PREFIX)
 
 @app.on_event("startup")
 async def on_startup():
     recreate_tables()
+    with Session(engine) as session:
+        add_training_unique_index(session)
+        migrate_scale_columns(session)
+        add_workout_context_indexes(session)
 
 @app.get("/")
 async def root():
@@ -2,6 +2,7 @@ from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
 from enum import Enum
+from functools import cached_property
 
 class ActivityType(str, Enum):
     RUN = "Run"
@@ -64,10 +65,14 @@ class StravaActivity(SQLModel, table=True):
     # Import Info
     imported_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # Derived values below are cached on the instance; rows aren't modified after loading
+    
+    @cached_property
     def distance_km(self) -> float:
         """Convert distance from meters to kilometers"""
         return self.distance / 1000
     
+    @cached_property
     def pace_per_km(self) -> Optional[str]:
         """Calculate pace in MM:SS/km format for runs"""
         if self.type != ActivityType.RUN or not self.distance or not self.moving_time:
@@ -79,6 +84,7 @@ class StravaActivity(SQLModel, table=True):
         seconds = int(pace_seconds % 60)
         return f"{minutes}:{seconds:02d}"
     
+    @cached_property
     def duration_formatted(self) -> str:
         """Format duration as HH:MM:SS"""
         hours = self.moving_time // 3600
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, text
 from typing import Optional, List
 from datetime import date
 from enum import Enum
@@ -21,6 +22,16 @@ class WorkoutStatus(str, Enum):
     SKIPPED = "skipped"
 
 class Training(SQLModel, table=True):
+    # One plan workout per user, day, type and plan source; manual logs (NULL plan_source) may repeat
+    __table_args__ = (
+        Index(
+            "uq_training_plan_day", "user_id", "date", "type", "plan_source", unique=True,
+            sqlite_where=text("plan_source IS NOT NULL"),
+            postgresql_where=text("plan_source IS NOT NULL")
+        ),
+        {"extend_existing": True},
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     date: date
@@ -52,9 +63,6 @@ class Training(SQLModel, table=True):
     plan_source: Optional[str] = None  # e.g., "coach_photo", "ai_generated", "manual"
     plan_title: Optional[str] = None  # Title of the plan this workout belongs to
     intensity: Optional[str] = None  # Intensity description (e.g., "Easy pace", "Threshold")
-    
-    class Config:
-        table_args = {"extend_existing": True}
 
 class TrainingPlan(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
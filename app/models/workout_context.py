@@ -1,8 +1,43 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Session, select
+from pydantic import ValidationError, computed_field, field_validator, model_validator
+from sqlalchemy import BigInteger, Column, Index, JSON, SmallInteger, TypeDecorator, delete, event, func, insert, inspect
+from sqlalchemy.dialects.postgresql import JSONB
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 import json
+import re
+import sys
+import msgspec
+import numpy as np
+
+# Interval fields as entered on the context form, e.g. time "1:30" and distance "400m" / "1.2km"
+_TIME_RE = re.compile(r'^(\d+):(\d{1,2})$')
+_DISTANCE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?|\.\d+)\s*(km|m)\s*$', re.I)
+# Plain seconds for rests, e.g. "90s" or "90"
+_SECONDS_RE = re.compile(r'^\s*(\d+)\s*s?\s*$', re.I)
+# Sessions with at least this many work intervals are summed with NumPy
+_NUMPY_MIN_INTERVALS = 16
+
+# Cap on the free-text note fields (also sizes their VARCHAR columns)
+NOTE_MAX_LENGTH = 4096
+
+# JSON column type: TEXT-backed JSON on SQLite, binary JSONB on PostgreSQL
+_JSON = JSON().with_variant(JSONB(), "postgresql")
+
+class IntervalRec(msgspec.Struct, omit_defaults=True):
+    """Schema for one packed interval (other keys are allowed and kept as they are)"""
+    distance: Optional[str] = None
+    time: Optional[str] = None
+    rest: Optional[str] = None
+    hr_avg: Optional[float] = None  # table editors hand back floats
+
+_INTERVALS_ENCODER = msgspec.msgpack.Encoder()
+_INTERVALS_DECODER = msgspec.msgpack.Decoder(List[dict])
+
+def _utcnow() -> datetime:
+    """Timezone-aware current UTC time (datetime.utcnow is deprecated)"""
+    return datetime.now(timezone.utc)
 
 class WorkoutType(str, Enum):
     EASY_RUN = "Easy Run"
@@ -34,41 +69,132 @@ class WeatherCondition(str, Enum):
     HUMID = "Humid"
     SNOWY = "Snowy"
 
+# Intern the enum values so every copy of e.g. "Easy Run" is the same object
+for _enum_cls in (WorkoutType, TerrainType, WeatherCondition):
+    for _member in _enum_cls:
+        object.__setattr__(_member, "_value_", sys.intern(_member.value))
+
+# value -> member maps for the enum fields, built once at import
+_WT_LOOKUP = {sys.intern(m.value): m for m in WorkoutType}
+_TERRAIN_LOOKUP = {sys.intern(m.value): m for m in TerrainType}
+_WEATHER_LOOKUP = {sys.intern(m.value): m for m in WeatherCondition}
+_ENUM_LOOKUPS = {"workout_type": _WT_LOOKUP, "terrain": _TERRAIN_LOOKUP, "weather": _WEATHER_LOOKUP}
+
+class _EnumCode(TypeDecorator):
+    """Persist a str Enum as a SMALLINT code; Python code still sees the Enum member.
+
+    Codes are 1-based declaration order, so new members must be appended at the end.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_cls):
+        super().__init__()
+        self.enum_cls = enum_cls
+        self._members = list(enum_cls)
+        # str Enum members hash like their values, so both "Easy Run" and WorkoutType.EASY_RUN hit
+        self._codes = {member: code for code, member in enumerate(self._members, 1)}
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self._codes[value]
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self._members[value - 1]
+
+# Bit offset of each 1-10 scale field within WorkoutContext.scales_packed; a 0 nibble means not recorded
+SCALE_BITS = {
+    "rpe_work_intervals": 0,
+    "rpe_overall": 4,
+    "energy_level_pre": 8,
+    "energy_level_post": 12,
+    "motivation": 16,
+    "sleep_quality_previous_night": 20,
+    "soreness_pre": 24,
+    "soreness_post": 28,
+}
+
+def _pack_scale(packed: int, name: str, value: Optional[int]) -> int:
+    """Set one scale field's nibble in a scales_packed value"""
+    if value is not None and not 1 <= value <= 10:
+        raise ValueError(f"{name} must be between 1 and 10")
+    shift = SCALE_BITS[name]
+    return (packed & ~(0xF << shift)) | ((value or 0) << shift)
+
+def _out_of_range_scales(data: dict) -> List[str]:
+    """Names of the scale fields in data that are set but not an int from 1 to 10"""
+    return [
+        name for name in SCALE_BITS
+        if data.get(name) is not None and not (isinstance(data[name], int) and 1 <= data[name] <= 10)
+    ]
+
+def _pack_scales(data: dict) -> dict:
+    """Fold any scale fields in constructor/request data into scales_packed"""
+    if not any(name in data for name in SCALE_BITS):
+        return data
+    data = dict(data)
+    packed = data.get("scales_packed") or 0
+    for name in SCALE_BITS:
+        if name in data:
+            packed = _pack_scale(packed, name, data.pop(name))
+    data["scales_packed"] = packed
+    return data
+
+def _scale_property(name: str):
+    """Read/write one 1-10 scale field stored as a nibble of scales_packed.
+
+    Exposed as a computed field so it still appears in model_dump and API responses.
+    """
+    shift = SCALE_BITS[name]
+
+    def get(self) -> Optional[int]:
+        return (self.scales_packed >> shift) & 0xF or None
+
+    def set(self, value: Optional[int]):
+        self.scales_packed = _pack_scale(self.scales_packed, name, value)
+
+    return computed_field(property(get, set))
+
 class WorkoutContext(SQLModel, table=True):
     """Enhanced workout context that users can add to their Strava activities"""
+    __table_args__ = (
+        Index("ix_wc_user_activity", "user_id", "strava_activity_id"),
+        Index("ix_wc_user_created", "user_id", "created_at"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     strava_activity_id: int = Field(foreign_key="stravaactivity.strava_id", unique=True)
     
     # Workout Classification
-    workout_type: WorkoutType
-    terrain: Optional[TerrainType] = None
+    workout_type: WorkoutType = Field(sa_column=Column(_EnumCode(WorkoutType), nullable=False))
+    terrain: Optional[TerrainType] = Field(default=None, sa_column=Column(_EnumCode(TerrainType)))
     
-    # Interval Details (JSON stored as string)
-    intervals_data: Optional[str] = None  # JSON: [{"distance": "400m", "time": "1:30", "rest": "90s", "hr_avg": 180}]
+    # Interval Details (native JSON column, JSONB on PostgreSQL).
+    # Deprecated for analytics: WorkoutInterval holds the same data as typed columns.
+    intervals_data: Optional[List[dict]] = Field(default=None, sa_column=Column(_JSON))  # [{"distance": "400m", "time": "1:30", "rest": "90s", "hr_avg": 180}]
     
     # Performance Metrics
     avg_hr_work_intervals: Optional[int] = None  # Average HR during work portions only
     max_hr_session: Optional[int] = None
     lactate_measurement: Optional[float] = None  # mmol/L
-    rpe_work_intervals: Optional[int] = None  # 1-10 scale for work intervals
-    rpe_overall: Optional[int] = None  # 1-10 scale for entire session
+    rpe_work_intervals = _scale_property("rpe_work_intervals")  # 1-10 scale for work intervals
+    rpe_overall = _scale_property("rpe_overall")  # 1-10 scale for entire session
     
     # Environmental Factors
-    weather: Optional[WeatherCondition] = None
+    weather: Optional[WeatherCondition] = Field(default=None, sa_column=Column(_EnumCode(WeatherCondition)))
     temperature: Optional[float] = None  # Celsius
     humidity: Optional[int] = None  # Percentage
     
     # Subjective Metrics
-    energy_level_pre: Optional[int] = None  # 1-10 scale
-    energy_level_post: Optional[int] = None  # 1-10 scale
-    motivation: Optional[int] = None  # 1-10 scale
-    sleep_quality_previous_night: Optional[int] = None  # 1-10 scale
+    energy_level_pre = _scale_property("energy_level_pre")  # 1-10 scale
+    energy_level_post = _scale_property("energy_level_post")  # 1-10 scale
+    motivation = _scale_property("motivation")  # 1-10 scale
+    sleep_quality_previous_night = _scale_property("sleep_quality_previous_night")  # 1-10 scale
     
     # Context Notes
-    workout_description: Optional[str] = None  # Detailed description
-    coaching_notes: Optional[str] = None  # Coach or self-coaching notes
-    how_it_felt: Optional[str] = None  # Free text about how the workout felt
+    workout_description: Optional[str] = Field(default=None, max_length=NOTE_MAX_LENGTH)  # Detailed description
+    coaching_notes: Optional[str] = Field(default=None, max_length=NOTE_MAX_LENGTH)  # Coach or self-coaching notes
+    how_it_felt: Optional[str] = Field(default=None, max_length=NOTE_MAX_LENGTH)  # Free text about how the workout felt
     
     # Goals and Targets
     target_pace: Optional[str] = None  # e.g., "4:00/km"
@@ -76,58 +202,222 @@ class WorkoutContext(SQLModel, table=True):
     goal_achieved: Optional[bool] = None
     
     # Recovery and Readiness
-    soreness_pre: Optional[int] = None  # 1-10 scale
-    soreness_post: Optional[int] = None  # 1-10 scale
+    soreness_pre = _scale_property("soreness_pre")  # 1-10 scale
+    soreness_post = _scale_property("soreness_post")  # 1-10 scale
+    
+    # All 1-10 scale fields above, 4 bits each (see SCALE_BITS)
+    scales_packed: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
     
     # Timestamps
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
+    
+    def __init__(self, **data):
+        # Table models skip validators in __init__, so check and pack the scale kwargs here too
+        bad = _out_of_range_scales(data)
+        if bad:
+            raise ValidationError.from_exception_data(type(self).__name__, [
+                {"type": "value_error", "loc": (name,), "input": data[name],
+                 "ctx": {"error": ValueError("must be between 1 and 10")}}
+                for name in bad
+            ])
+        super().__init__(**_pack_scales(data))
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _scales_from_fields(cls, data):
+        """Accept the scale fields by name (model_validate / request bodies)"""
+        if not isinstance(data, dict):
+            return data
+        bad = _out_of_range_scales(data)
+        if bad:
+            raise ValueError(f"{', '.join(bad)} must be between 1 and 10")
+        return _pack_scales(data)
+    
+    @field_validator("intervals_data", mode="before")
+    @classmethod
+    def _intervals_from_json(cls, value):
+        """Older clients send intervals_data as a JSON string; decode it to the list"""
+        if isinstance(value, (str, bytes)):
+            return json.loads(value) if value else None
+        return value
+    
+    @field_validator("workout_type", "terrain", "weather", mode="before")
+    @classmethod
+    def _enum_from_value(cls, value, info):
+        """Map raw strings to Enum members with a plain dict lookup instead of Enum.__call__"""
+        if isinstance(value, str):
+            return _ENUM_LOOKUPS[info.field_name].get(value, value)
+        return value
     
     def get_intervals_data(self) -> List[dict]:
-        """Parse intervals data from JSON string"""
-        if not self.intervals_data:
-            return []
-        try:
-            return json.loads(self.intervals_data)
-        except:
-            return []
+        """Intervals list (the JSON column is decoded by the database driver)"""
+        return self.intervals_data or []
     
     def set_intervals_data(self, intervals: List[dict]):
-        """Store intervals data as JSON string"""
-        self.intervals_data = json.dumps(intervals)
+        """Store intervals data (use this rather than mutating intervals_data in place, which the pace cache can't see)"""
+        self.intervals_data = intervals
+        self.__dict__.pop("_pace_cache", None)
+    
+    def interval_records(self) -> List[dict]:
+        """WorkoutInterval column values for this session's intervals, ready for a bulk insert (needs self.id)"""
+        records = []
+        for idx, interval in enumerate(self.get_intervals_data()):
+            distance_km = _parse_distance_km(interval.get('distance'))
+            records.append({
+                "workout_context_id": self.id,
+                "idx": idx,
+                "distance_m": round(distance_km * 1000) if distance_km is not None else None,
+                "time_s": _parse_seconds(interval.get('time')),
+                "rest_s": _parse_seconds(interval.get('rest')),
+                "hr_avg": _parse_heart_rate(interval.get('hr_avg'))
+            })
+        return records
     
-    def calculate_true_work_pace(self) -> Optional[str]:
-        """Calculate actual pace during work intervals"""
+    def pack_intervals(self) -> bytes:
+        """Intervals as msgpack bytes, for caches outside the database"""
+        return _INTERVALS_ENCODER.encode(self.get_intervals_data())
+    
+    def set_intervals_from_pack(self, data: bytes):
+        """Store intervals from pack_intervals() output
+
+        The dicts are stored as decoded, so unknown keys and int/float values survive
+        the round trip; IntervalRec only checks the known fields.
+        """
+        intervals = _INTERVALS_DECODER.decode(data)
+        msgspec.convert(intervals, List[IntervalRec], strict=False)
+        self.set_intervals_data(intervals)
+    
+    def calculate_true_work_pace(self, session: Optional[Session] = None) -> Optional[str]:
+        """Calculate actual pace during work intervals
+
+        With a session the totals come from one SUM over the WorkoutInterval rows;
+        sessions that have not been backfilled yet fall back to parsing intervals_data.
+        """
+        if session is not None and self.id is not None:
+            total_time, total_distance_m = session.exec(
+                select(func.sum(WorkoutInterval.time_s), func.sum(WorkoutInterval.distance_m)).where(
+                    WorkoutInterval.workout_context_id == self.id,
+                    WorkoutInterval.time_s.is_not(None),
+                    WorkoutInterval.distance_m.is_not(None)
+                )
+            ).one()
+            if total_time is not None:
+                return _format_pace(total_time, total_distance_m / 1000)
+        
         intervals = self.get_intervals_data()
         if not intervals:
             return None
         
-        total_work_time = 0
-        total_work_distance = 0
+        # Memoized on the instance, keyed on the intervals list object and updated_at
+        cache = self.__dict__.get("_pace_cache")
+        if cache is not None and cache[0] is intervals and cache[1] == self.updated_at:
+            return cache[2]
         
-        for interval in intervals:
-            if 'time' in interval and 'distance' in interval:
-                # Parse time (format: "1:30" -> 90 seconds)
-                time_parts = interval['time'].split(':')
-                if len(time_parts) == 2:
-                    time_seconds = int(time_parts[0]) * 60 + int(time_parts[1])
-                    
-                    # Parse distance (format: "400m" -> 0.4 km)
-                    distance_str = interval['distance'].lower()
-                    if 'm' in distance_str and 'km' not in distance_str:
-                        distance_km = float(distance_str.replace('m', '')) / 1000
-                    elif 'km' in distance_str:
-                        distance_km = float(distance_str.replace('km', ''))
-                    else:
-                        continue
-                    
-                    total_work_time += time_seconds
-                    total_work_distance += distance_km
+        # Parsed (seconds, km) per work interval
+        times = []
+        distances = []
+        for time_s, distance_km in _work_intervals(intervals):
+            times.append(time_s)
+            distances.append(distance_km)
         
-        if total_work_time > 0 and total_work_distance > 0:
-            pace_seconds_per_km = total_work_time / total_work_distance
-            minutes = int(pace_seconds_per_km // 60)
-            seconds = int(pace_seconds_per_km % 60)
-            return f"{minutes}:{seconds:02d}"
+        # NumPy only pays off past its fixed per-call overhead
+        if len(times) >= _NUMPY_MIN_INTERVALS:
+            total_work_time = int(np.fromiter(times, dtype=np.int64, count=len(times)).sum())
+            total_work_distance = float(np.fromiter(distances, dtype=np.float64, count=len(distances)).sum())
+        else:
+            total_work_time = sum(times)
+            total_work_distance = sum(distances)
         
-        return None 
\ No newline at end of file
+        pace = _format_pace(total_work_time, total_work_distance)
+        object.__setattr__(self, "_pace_cache", (intervals, self.updated_at, pace))
+        return pace
+    
+    @classmethod
+    def bulk_work_pace(cls, contexts: List["WorkoutContext"]) -> List[Optional[str]]:
+        """calculate_true_work_pace for many contexts at once, with one NumPy reduction over all their intervals"""
+        times = []
+        distances = []
+        groups = []
+        for group, context in enumerate(contexts):
+            for time_s, distance_km in _work_intervals(context.get_intervals_data()):
+                times.append(time_s)
+                distances.append(distance_km)
+                groups.append(group)
+        if not groups:
+            return [None] * len(contexts)
+        
+        # Per-context totals: bincount sums the weights that share a group index
+        group_ids = np.fromiter(groups, dtype=np.intp, count=len(groups))
+        total_times = np.bincount(group_ids, weights=np.asarray(times, dtype=np.float64), minlength=len(contexts))
+        total_distances = np.bincount(group_ids, weights=np.asarray(distances, dtype=np.float64), minlength=len(contexts))
+        return [_format_pace(t, d) for t, d in zip(total_times.tolist(), total_distances.tolist())]
+
+class WorkoutInterval(SQLModel, table=True):
+    """One interval of a WorkoutContext as typed columns, so pace totals are a SQL aggregate"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    workout_context_id: int = Field(foreign_key="workoutcontext.id", index=True)
+    idx: int  # position within the session
+    distance_m: Optional[int] = None
+    time_s: Optional[int] = None
+    rest_s: Optional[int] = None
+    hr_avg: Optional[int] = Field(default=None, sa_column=Column(SmallInteger))
+
+def write_interval_rows(connection, context: WorkoutContext) -> int:
+    """Replace a context's WorkoutInterval rows with ones built from its intervals_data"""
+    connection.execute(delete(WorkoutInterval).where(WorkoutInterval.workout_context_id == context.id))
+    records = context.interval_records()
+    if records:
+        connection.execute(insert(WorkoutInterval), records)
+    return len(records)
+
+@event.listens_for(WorkoutContext, "after_insert")
+@event.listens_for(WorkoutContext, "after_update")
+def _sync_interval_rows(mapper, connection, context: WorkoutContext):
+    """Keep WorkoutInterval in step with intervals_data whenever a context is saved"""
+    if inspect(context).attrs.intervals_data.history.has_changes():
+        write_interval_rows(connection, context)
+
+def _work_intervals(intervals: List[dict]):
+    """Yield (seconds, km) for each interval with a parseable time and distance"""
+    for interval in intervals:
+        if 'time' in interval and 'distance' in interval:
+            # Time "1:30" -> 90 seconds, distance "400m" -> 0.4 km
+            time_s = _parse_seconds(interval['time'])
+            distance_km = _parse_distance_km(interval['distance'])
+            if time_s is not None and distance_km is not None:
+                yield time_s, distance_km
+
+def _parse_seconds(value) -> Optional[int]:
+    """Interval time/rest to seconds: "1:30" -> 90, "90s" or "90" -> 90"""
+    if value is None:
+        return None
+    value = str(value)
+    match = _TIME_RE.match(value)
+    if match:
+        return int(match.group(1)) * 60 + int(match.group(2))
+    match = _SECONDS_RE.match(value)
+    return int(match.group(1)) if match else None
+
+def _parse_distance_km(value) -> Optional[float]:
+    """Interval distance to km: "400m" -> 0.4, "1.2km" -> 1.2"""
+    match = _DISTANCE_RE.match(str(value)) if value is not None else None
+    if not match:
+        return None
+    distance, unit = match.groups()
+    return float(distance) / (1 if unit.lower() == 'km' else 1000)
+
+def _parse_heart_rate(value) -> Optional[int]:
+    """Interval average HR as an int bpm (table editors may hand back floats or NaN)"""
+    if isinstance(value, (int, float)) and value == value:
+        return int(value)
+    return None
+
+def _format_pace(total_seconds: float, total_km: float) -> Optional[str]:
+    """Pace as "m:ss" per km, or None without both time and distance"""
+    if total_seconds > 0 and total_km > 0:
+        pace_seconds_per_km = total_seconds / total_km
+        minutes = int(pace_seconds_per_km // 60)
+        seconds = int(pace_seconds_per_km % 60)
+        return f"{minutes}:{seconds:02d}"
+    return None
@@ -1,8 +1,21 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, StringConstraints, TypeAdapter, computed_field
+from typing import Annotated, List, Optional
 from datetime import datetime, date
 from enum import Enum
 
+from app.config import settings
+
+# RFC 5321 subset: dot-atom local part and a dotted domain of LDH labels
+_EMAIL_RE_STR = (
+    r"^[A-Za-z0-9.!#$%&'*+/=?^_`{|}~-]+"
+    r"@[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+    r"(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)+$"
+)
+
+Email = EmailStr if settings.STRICT_EMAIL_VALIDATION else Annotated[
+    str, StringConstraints(pattern=_EMAIL_RE_STR, max_length=254)
+]
+
 class ExperienceLevel(str, Enum):
     BEGINNER = "beginner"
     INTERMEDIATE = "intermediate"
@@ -10,7 +23,7 @@ class ExperienceLevel(str, Enum):
     ELITE = "elite"
 
 class UserBase(BaseModel):
-    email: EmailStr
+    email: Email
     full_name: str
     date_of_birth: date
     gender: str
@@ -19,18 +32,27 @@ class UserBase(BaseModel):
     experience_level: ExperienceLevel
     preferred_run_time: str
     long_run_day: str
-    age: Optional[int] = None
     weight: Optional[float] = None
     height: Optional[float] = None
     fitness_level: Optional[str] = None
     training_frequency: Optional[int] = None
 
+    @computed_field
+    @property
+    def age(self) -> int:
+        """Age in whole years, derived from date_of_birth"""
+        today = date.today()
+        born = self.date_of_birth
+        return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
 class UserCreate(UserBase):
     password: str
 
 class UserUpdate(BaseModel):
+    # No model_config: pydantic's default extra="ignore" drops unknown fields
+    # (e.g. "age", now derived from date_of_birth) instead of rejecting them
+
     full_name: Optional[str] = None
-    age: Optional[int] = None
     weight: Optional[float] = None
     height: Optional[float] = None
     fitness_level: Optional[str] = None
@@ -43,8 +65,20 @@ class UserResponse(UserBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, extra="forbid", frozen=True)
+
+    @classmethod
+    def from_orm_trusted(cls, orm_obj) -> "UserResponse":
+        """Build from a trusted ORM row without re-validating it (request bodies still go through validation)"""
+        return cls.model_construct(**{
+            name: getattr(orm_obj, name) for name in cls.model_fields if hasattr(orm_obj, name)
+        })
+
+_USER_LIST_ADAPTER = TypeAdapter(List[UserResponse])
+
+def user_list_json(users: List[UserResponse]) -> bytes:
+    """Serialize a list of users to JSON bytes in one pydantic-core pass (return via Response(media_type="application/json"))"""
+    return _USER_LIST_ADAPTER.dump_json(users)
 
 class Token(BaseModel):
     access_token: str
@@ -1,20 +1,79 @@
+import asyncio
 import json
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
-from openai import OpenAI
-from sqlmodel import Session, select
+import random
+import re
+import time
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import numpy as np
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from sqlalchemy import event
+from sqlmodel import Session, func, select
 
 from app.config import settings
 from app.models.strava import StravaActivity, ActivityType
 from app.models.user import User
 from app.models.workout_context import WorkoutContext
+from app.models.training import Training
 from app.schemas.chat import ChatMessage
 
+# Interval sets like "7x600m", "6 x 800m" or "2 x 1.5km"
+_INTERVAL_RE = re.compile(r'(\d+)\s*x\s*(\d+(?:\.\d+)?)\s*(km|m)\b', re.IGNORECASE)
 
-class AICoachService:
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
-        self.system_prompt = f"""You are an expert AI running coach with deep knowledge of training principles, exercise physiology, and performance optimization. 
+# First number in a distance such as "8km" or "5.5 miles"
+_NUM_RE = re.compile(r'(\d+(?:\.\d+)?)')
+
+# Month names as they may appear in plan titles
+_MONTH_NAMES = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december"
+)
+_MONTH_SET = frozenset(_MONTH_NAMES)
+_WORD_RE = re.compile(r'[a-z]+')
+
+# Day name -> offset from Monday
+_DAY_OFFSETS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6
+}
+
+# Rate limits, timeouts, dropped connections and 5xx responses are worth another try
+_TRANSIENT_OPENAI_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+COMPLETION_ATTEMPTS = 3
+
+# Completion budget for a generated plan: the 4-week default fits in the minimum, longer plans scale
+PLAN_MIN_TOKENS = 2000
+PLAN_TOKENS_PER_WEEK = 500
+
+# Per-user training analysis cache
+ANALYSIS_CACHE_TTL = 300  # seconds
+ANALYSIS_CACHE_SIZE = 1024
+
+# (user_id, days_back, generate_insights, light) -> (expires_at, analysis); module level so
+# the model write events below can invalidate it for every AICoachService
+_ANALYSIS_CACHE: Dict[Tuple[int, int, bool, bool], Tuple[float, Dict[str, Any]]] = {}
+
+def _drop_cached_analyses(user_id: int) -> None:
+    """Remove every cached analysis of a user"""
+    for key in list(_ANALYSIS_CACHE):
+        if key[0] == user_id:
+            _ANALYSIS_CACHE.pop(key, None)
+
+@event.listens_for(WorkoutContext, "after_insert")
+@event.listens_for(WorkoutContext, "after_update")
+@event.listens_for(WorkoutContext, "after_delete")
+@event.listens_for(Training, "after_insert")
+@event.listens_for(Training, "after_update")
+@event.listens_for(Training, "after_delete")
+def _invalidate_on_write(mapper, connection, target):
+    """Saving a workout context or training makes that user's cached analyses stale"""
+    _drop_cached_analyses(target.user_id)
+
+NO_API_KEY_REPLY = "I'm sorry, but AI coaching features require an OpenAI API key to be configured. Please check with your administrator."
+
+
+_SYSTEM_PROMPT_TEMPLATE = """You are an expert AI running coach with deep knowledge of training principles, exercise physiology, and performance optimization. 
 
 Your role is to:
 - Analyze running data and provide personalized insights
@@ -24,7 +83,7 @@ Your role is to:
 - Provide motivation while maintaining realistic expectations
 
 IMPORTANT DATE INFORMATION:
-- TODAY'S DATE: {datetime.now().strftime('%A, %B %d, %Y')}
+- TODAY'S DATE: {today}
 - When users ask about the current date, always use the date above
 - Training plan dates are historical/future dates and should not be confused with today's date
 - Plan dates show when workouts are scheduled, not the current date
@@ -46,111 +105,254 @@ Always be:
 
 Use the athlete's actual data and training plan to provide personalized advice."""
 
+@lru_cache(maxsize=2)
+def _system_prompt_for(day: date) -> str:
+    """System prompt for a given day; built once per date"""
+    return _SYSTEM_PROMPT_TEMPLATE.format(today=day.strftime('%A, %B %d, %Y'))
+
+
+@lru_cache(maxsize=1)
+def _openai_client() -> Optional[AsyncOpenAI]:
+    """Process-wide OpenAI client, created on first use so every service shares its connection pool"""
+    if not settings.OPENAI_API_KEY:
+        return None
+    # Retries are handled by AICoachService._completion, so the SDK's own are turned off
+    return AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+
+
+class AICoachService:
+    def __init__(self):
+        self.client = _openai_client()
+        self._analysis_cache = _ANALYSIS_CACHE
+        self._analysis_locks: Dict[Tuple[int, int, bool, bool], asyncio.Lock] = {}
+
+    @property
+    def system_prompt(self) -> str:
+        """Coach system prompt with today's date filled in"""
+        return _system_prompt_for(date.today())
+
+    async def _completion(self, **kwargs):
+        """chat.completions.create, retried with jittered exponential backoff on transient errors"""
+        for attempt in range(COMPLETION_ATTEMPTS):
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except _TRANSIENT_OPENAI_ERRORS:
+                if attempt == COMPLETION_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(random.uniform(1, min(20, 2 ** (attempt + 1))))
+
     async def analyze_training_data(
         self, 
         session: Session, 
         user_id: int, 
-        days_back: int = 30
+        days_back: int = 30,
+        activities: Optional[List[StravaActivity]] = None,
+        generate_insights: bool = True,
+        light: bool = False
     ) -> Dict[str, Any]:
-        """Analyze user's Strava activities and generate insights"""
+        """Analyze user's Strava activities and generate insights
+
+        Pass `activities` (runs from _recent_activities, newest first) to analyze an
+        already-fetched list instead of querying. Queried results are cached for
+        ANALYSIS_CACHE_TTL seconds per user and period. `light` returns only the
+        summary metrics, without workout contexts or AI insights.
+        """
+        if activities is not None:
+            return await self._analyze_activities(session, activities, None, generate_insights, light)
         
-        # Get recent activities
-        since_date = datetime.utcnow() - timedelta(days=days_back)
-        activities = session.exec(
-            select(StravaActivity)
-            .where(StravaActivity.user_id == user_id)
-            .where(StravaActivity.start_date >= since_date)
-            .order_by(StravaActivity.start_date.desc())
-        ).all()
+        key = (user_id, days_back, generate_insights, light)
+        cached = self._analysis_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        # One computation per key at a time; concurrent callers wait for it and reuse the result
+        async with self._analysis_locks.setdefault(key, asyncio.Lock()):
+            cached = self._analysis_cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            
+            # Get recent runs, plus counts over all activity types
+            analysis = await self._analyze_activities(
+                session,
+                self._recent_activities(session, user_id, days_back),
+                self._activity_stats(session, user_id, days_back),
+                generate_insights,
+                light
+            )
+            if len(self._analysis_cache) >= ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.pop(next(iter(self._analysis_cache)))
+            self._analysis_cache[key] = (time.monotonic() + ANALYSIS_CACHE_TTL, analysis)
+        self._analysis_locks.pop(key, None)
+        return analysis
+
+    def invalidate_training_analysis(self, user_id: int) -> None:
+        """Drop cached analyses for a user, e.g. after new activities are imported
+
+        Context and training saves already do this through the model write events.
+        """
+        _drop_cached_analyses(user_id)
 
+    async def _analyze_activities(
+        self,
+        session: Session,
+        activities: List[StravaActivity],
+        activity_stats: Optional[Tuple[int, Optional[datetime], Optional[datetime]]],
+        generate_insights: bool,
+        light: bool = False
+    ) -> Dict[str, Any]:
+        """Metrics (and optionally AI insights) for a list of runs"""
         if not activities:
             return {"error": "No activities found in the specified period"}
 
         # Calculate key metrics
-        analysis = self._calculate_training_metrics(activities, session)
+        analysis = self._calculate_training_metrics(activities, session, activity_stats, light)
         
         # Generate AI insights
-        if self.client:
+        if self.client and generate_insights and not light:
             ai_insights = await self._generate_ai_insights(analysis, activities)
             analysis["ai_insights"] = ai_insights
         
         return analysis
 
-    def _calculate_training_metrics(self, activities: List[StravaActivity], session: Session = None) -> Dict[str, Any]:
-        """Calculate training metrics from activities with enhanced context"""
+    def _recent_activities(self, session: Session, user_id: int, days_back: int) -> List[StravaActivity]:
+        """User's runs of at least 1km from the last `days_back` days, newest first"""
+        since_date = datetime.utcnow() - timedelta(days=days_back)
+        return session.exec(
+            select(StravaActivity)
+            .where(StravaActivity.user_id == user_id)
+            .where(StravaActivity.start_date >= since_date)
+            .where(StravaActivity.type == ActivityType.RUN)
+            .where(StravaActivity.distance > 1000)
+            .where(StravaActivity.moving_time > 0)
+            .order_by(StravaActivity.start_date.desc())
+        ).all()
+
+    def _activity_stats(self, session: Session, user_id: int, days_back: int) -> Tuple[int, Optional[datetime], Optional[datetime]]:
+        """Count, first and last start date of all the user's activities in the period"""
+        since_date = datetime.utcnow() - timedelta(days=days_back)
+        return tuple(session.exec(
+            select(func.count(), func.min(StravaActivity.start_date), func.max(StravaActivity.start_date))
+            .where(StravaActivity.user_id == user_id)
+            .where(StravaActivity.start_date >= since_date)
+        ).one())
+
+    def _calculate_training_metrics(
+        self,
+        activities: List[StravaActivity],
+        session: Session = None,
+        activity_stats: Optional[Tuple[int, Optional[datetime], Optional[datetime]]] = None,
+        light: bool = False
+    ) -> Dict[str, Any]:
+        """Calculate training metrics from runs with enhanced context
+
+        `activity_stats` is (count, first, last) over all activity types; without it the runs themselves are used.
+        """
         if not activities:
             return {}
 
         # Basic stats
-        total_activities = len(activities)
-        running_activities = [a for a in activities if a.type == ActivityType.RUN]
+        running_activities = activities
+        total_activities, first_start, last_start = activity_stats or (
+            len(activities), activities[-1].start_date, activities[0].start_date
+        )
         
-        # Distance and time
-        total_distance = sum(a.distance_km() for a in running_activities)
-        total_time_hours = sum(a.moving_time for a in running_activities) / 3600
-        
-        # Pace analysis
-        paces = []
+        # Per-run columns, filled in the single pass below so the aggregates are NumPy reductions
+        n_runs = len(running_activities)
+        distances_km = np.empty(n_runs, dtype=np.float64)
+        moving_times = np.empty(n_runs, dtype=np.float64)
+        heart_rates = np.empty(n_runs, dtype=np.float64)
         enhanced_activities = []
         
-        for activity in running_activities:
-            if activity.distance > 1000 and activity.moving_time > 0:  # At least 1km
-                pace_seconds = activity.moving_time / (activity.distance / 1000)
-                paces.append(pace_seconds)
-                
-                # Get enhanced context if available
-                context = None
-                if session:
-                    context = session.exec(
-                        select(WorkoutContext).where(
-                            WorkoutContext.strava_activity_id == activity.strava_id
-                        )
-                    ).first()
-                
-                activity_data = {
-                    "name": activity.name,
-                    "distance_km": activity.distance_km(),
-                    "pace": activity.pace_per_km(),
-                    "date": activity.start_date.strftime("%Y-%m-%d"),
-                    "heart_rate": activity.average_heartrate,
-                    "strava_id": activity.strava_id
-                }
-                
-                # Add enhanced context data
-                if context:
-                    activity_data.update({
-                        "workout_type": context.workout_type.value if context.workout_type else None,
-                        "true_work_pace": context.calculate_true_work_pace(),
-                        "avg_hr_work_intervals": context.avg_hr_work_intervals,
-                        "lactate": context.lactate_measurement,
-                        "rpe_work": context.rpe_work_intervals,
-                        "rpe_overall": context.rpe_overall,
-                        "goal_achieved": context.goal_achieved,
-                        "how_it_felt": context.how_it_felt,
-                        "intervals_count": len(context.get_intervals_data()) if context.intervals_data else 0
-                    })
-                
-                enhanced_activities.append(activity_data)
+        # Enhanced contexts for all runs in one query
+        contexts_by_activity = {}
+        work_paces = {}
+        if session and not light:
+            contexts = list(session.exec(
+                select(WorkoutContext).where(
+                    WorkoutContext.strava_activity_id.in_([a.strava_id for a in running_activities])
+                )
+            ))
+            contexts_by_activity = {c.strava_activity_id: c for c in contexts}
+            # Work paces from the loaded intervals_data, one reduction for all contexts
+            work_paces = dict(zip((c.strava_activity_id for c in contexts), WorkoutContext.bulk_work_pace(contexts)))
+        
+        for i, activity in enumerate(running_activities):
+            d_km = activity.distance_km
+            distances_km[i] = d_km
+            moving_times[i] = activity.moving_time
+            heart_rates[i] = activity.average_heartrate or np.nan
+            if light and i >= 5:
+                continue  # Only the recent runs are reported in a light summary
+            
+            # Get enhanced context if available
+            context = contexts_by_activity.get(activity.strava_id)
+            
+            activity_data = {
+                "name": activity.name,
+                "distance_km": d_km,
+                "pace": activity.pace_per_km,
+                "date": activity.start_date.strftime("%Y-%m-%d"),
+                "heart_rate": activity.average_heartrate,
+                "strava_id": activity.strava_id
+            }
+            
+            # Add enhanced context data
+            if context:
+                activity_data.update({
+                    "workout_type": context.workout_type.value if context.workout_type else None,
+                    "true_work_pace": work_paces.get(activity.strava_id),
+                    "avg_hr_work_intervals": context.avg_hr_work_intervals,
+                    "lactate": context.lactate_measurement,
+                    "rpe_work": context.rpe_work_intervals,
+                    "rpe_overall": context.rpe_overall,
+                    "goal_achieved": context.goal_achieved,
+                    "how_it_felt": context.how_it_felt,
+                    "intervals_count": len(context.get_intervals_data()) if context.intervals_data else 0
+                })
+            
+            enhanced_activities.append(activity_data)
         
-        avg_pace_seconds = sum(paces) / len(paces) if paces else 0
+        # Distance and time
+        total_distance = float(distances_km.sum())
+        total_time_hours = float(moving_times.sum()) / 3600
+        
+        # Pace analysis (the query only returns runs of at least 1km)
+        paces = moving_times / distances_km
+        avg_pace_seconds = float(paces.mean()) if paces.size else 0
         
         # Heart rate analysis
-        hr_activities = [a for a in running_activities if a.average_heartrate]
-        avg_hr = sum(a.average_heartrate for a in hr_activities) / len(hr_activities) if hr_activities else None
+        has_hr = ~np.isnan(heart_rates) & (heart_rates != 0)
+        avg_hr = float(heart_rates[has_hr].mean()) if has_hr.any() else None
         
         # Training frequency
-        days_span = (activities[0].start_date - activities[-1].start_date).days + 1
+        days_span = (last_start - first_start).days + 1
         weekly_frequency = (total_activities / days_span) * 7 if days_span > 0 else 0
         
         # Weekly distance
         weekly_distance = (total_distance / days_span) * 7 if days_span > 0 else 0
         
         # Longest run
-        longest_run = max((a.distance_km() for a in running_activities), default=0)
+        longest_run = float(distances_km.max()) if n_runs else 0
+        
+        # Pace consistency (sample standard deviation)
+        pace_consistency = float(paces.std(ddof=1)) if paces.size > 1 else 0
         
-        # Pace consistency (standard deviation)
-        import statistics
-        pace_consistency = statistics.stdev(paces) if len(paces) > 1 else 0
+        summary = {
+            "period_days": days_span,
+            "total_activities": total_activities,
+            "running_activities": len(running_activities),
+            "total_distance_km": round(total_distance, 2),
+            "total_time_hours": round(total_time_hours, 1),
+            "weekly_frequency": round(weekly_frequency, 1),
+            "weekly_distance_km": round(weekly_distance, 2),
+            "average_pace_per_km": self._format_pace(int(avg_pace_seconds)),
+            "average_heart_rate": round(avg_hr) if avg_hr else None,
+            "longest_run_km": round(longest_run, 2),
+            "pace_consistency_seconds": round(pace_consistency, 0),
+            "recent_activities": enhanced_activities[:5],  # Last 5 runs with context
+        }
+        if light:
+            return summary
         
         # Enhanced analysis with context
         workout_types = {}
@@ -173,18 +375,7 @@ Use the athlete's actual data and training plan to provide personalized advice."
         avg_lactate = round(avg_lactate / lactate_count, 1) if lactate_count > 0 else None
         
         return {
-            "period_days": days_span,
-            "total_activities": total_activities,
-            "running_activities": len(running_activities),
-            "total_distance_km": round(total_distance, 2),
-            "total_time_hours": round(total_time_hours, 1),
-            "weekly_frequency": round(weekly_frequency, 1),
-            "weekly_distance_km": round(weekly_distance, 2),
-            "average_pace_per_km": self._format_pace(avg_pace_seconds),
-            "average_heart_rate": round(avg_hr) if avg_hr else None,
-            "longest_run_km": round(longest_run, 2),
-            "pace_consistency_seconds": round(pace_consistency, 0),
-            "recent_activities": enhanced_activities[:5],  # Last 5 runs with context
+            **summary,
             # Enhanced metrics
             "workout_types": workout_types,
             "interval_sessions": interval_sessions,
@@ -192,12 +383,13 @@ Use the athlete's actual data and training plan to provide personalized advice."
             "context_enhanced": len([a for a in enhanced_activities if a.get("workout_type")]),
         }
 
-    def _format_pace(self, pace_seconds: float) -> str:
-        """Format pace in MM:SS format"""
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _format_pace(pace_seconds: int) -> str:
+        """Format pace in MM:SS format (whole seconds, so results can be cached)"""
         if pace_seconds <= 0:
             return "N/A"
-        minutes = int(pace_seconds // 60)
-        seconds = int(pace_seconds % 60)
+        minutes, seconds = divmod(pace_seconds, 60)
         return f"{minutes}:{seconds:02d}"
 
     async def _generate_ai_insights(
@@ -210,12 +402,24 @@ Use the athlete's actual data and training plan to provide personalized advice."
         if not self.client:
             return "AI insights require OpenAI API key configuration."
 
+        # Only the fields that inform numeric insights, with short keys to save tokens
+        recent = [
+            {
+                "d": a["date"],
+                "km": a["distance_km"],
+                "pace": a["pace"],
+                "hr": a["heart_rate"],
+                "type": a.get("workout_type")
+            }
+            for a in metrics['recent_activities']
+        ]
+        
         # Prepare enhanced data for AI analysis
         enhanced_summary = ""
         if metrics.get('context_enhanced', 0) > 0:
             enhanced_summary = f"""
 Enhanced Training Context:
-- Workout types breakdown: {json.dumps(metrics.get('workout_types', {}), indent=2)}
+- Workout types breakdown: {json.dumps(metrics.get('workout_types', {}), separators=(',', ':'))}
 - Interval sessions: {metrics.get('interval_sessions', 0)}
 - Average lactate (when measured): {metrics.get('avg_lactate')} mmol/L
 - Enhanced activities: {metrics.get('context_enhanced', 0)}/{metrics['running_activities']} with context
@@ -234,11 +438,11 @@ Training Analysis ({metrics['period_days']} days):
 {enhanced_summary}
 
 Recent activities with context:
-{json.dumps(metrics['recent_activities'], indent=2)}
+{json.dumps(recent, separators=(',', ':'))}
         """
 
         try:
-            response = self.client.chat.completions.create(
+            response = await self._completion(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": self.system_prompt},
@@ -272,13 +476,57 @@ Keep it concise but actionable."""}
         """Get personalized coaching response based on user's data"""
         
         if not self.client:
-            return "I'm sorry, but AI coaching features require an OpenAI API key to be configured. Please check with your administrator."
+            return NO_API_KEY_REPLY
 
-        # Get recent training data for context
-        training_data = await self.analyze_training_data(session, user_id, days_back=14)
-        
-        # Get parsed plan context
-        plan_context = self._get_parsed_plan_context(user_id, session)
+        messages = await self._coaching_messages(user_message, session, user_id)
+        try:
+            response = await self._completion(
+                model="gpt-4o-mini",
+                messages=messages,
+                max_tokens=600,
+                temperature=0.7
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            return f"I'm having trouble processing your request right now. Error: {str(e)}"
+
+    async def stream_coaching_response(
+        self,
+        user_message: str,
+        session: Session,
+        user_id: int
+    ) -> AsyncIterator[str]:
+        """Like get_coaching_response, but returns the reply as an async iterator of text fragments"""
+        messages = await self._coaching_messages(user_message, session, user_id) if self.client else None
+
+        async def fragments():
+            if messages is None:
+                yield NO_API_KEY_REPLY
+                return
+            try:
+                stream = await self._completion(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=600,
+                    temperature=0.7,
+                    stream=True
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except Exception as e:
+                yield f"I'm having trouble processing your request right now. Error: {str(e)}"
+
+        return fragments()
+
+    async def _coaching_messages(self, user_message: str, session: Session, user_id: int) -> List[Dict[str, str]]:
+        """Build the chat messages for a coaching request, with the user's training and plan context"""
+        # Recent training data and parsed plan context; the plan lookup is blocking
+        # DB work, so it runs in a worker thread while the analysis is awaited
+        training_data, plan_context = await asyncio.gather(
+            self.analyze_training_data(session, user_id, days_back=14, light=True),
+            asyncio.to_thread(self._plan_context_in_thread, user_id, session),
+        )
         
         # Build context message
         context_msg = ""
@@ -294,25 +542,17 @@ Recent training context (last 14 days):
         if plan_context:
             context_msg += f"\n{plan_context}"
 
-        try:
-            messages = [
-                {"role": "system", "content": self.system_prompt + "\n\nAlways provide specific, actionable advice based on the athlete's actual training data."},
-            ]
-            
-            if context_msg:
-                messages.append({"role": "system", "content": context_msg})
-            
-            messages.append({"role": "user", "content": user_message})
-
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=600,
-                temperature=0.7
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"I'm having trouble processing your request right now. Error: {str(e)}"
+        messages = [
+            # Keep the first message byte-identical across calls so the prompt prefix stays cacheable
+            {"role": "system", "content": self.system_prompt},
+            {"role": "system", "content": "Always provide specific, actionable advice based on the athlete's actual training data."},
+        ]
+        
+        if context_msg:
+            messages.append({"role": "system", "content": context_msg})
+        
+        messages.append({"role": "user", "content": user_message})
+        return messages
 
     async def generate_weekly_insights(
         self,
@@ -321,14 +561,23 @@ Recent training context (last 14 days):
     ) -> Dict[str, Any]:
         """Generate weekly training insights and recommendations"""
         
+        # One fetch covers both weeks; split it at the 7-day mark
+        activities = self._recent_activities(session, user_id, days_back=14)
+        week_start = datetime.utcnow() - timedelta(days=7)
+        current_week = [a for a in activities if a.start_date >= week_start]
+        previous_week = activities[len(current_week):]
+        
         # Get last week's data
-        analysis = await self.analyze_training_data(session, user_id, days_back=7)
+        analysis = await self.analyze_training_data(session, user_id, days_back=7, activities=current_week)
         
         if "error" in analysis:
             return analysis
 
-        # Compare with previous week
-        prev_week_analysis = await self.analyze_training_data(session, user_id, days_back=14)
+        # Compare with previous week (numbers only, no AI insights needed)
+        if previous_week:
+            prev_week_analysis = self._calculate_training_metrics(previous_week, session)
+        else:
+            prev_week_analysis = {"error": "No activities found in the specified period"}
         
         insights = {
             "current_week": analysis,
@@ -360,7 +609,7 @@ Recent training context (last 14 days):
             return "Weekly recommendations require AI configuration."
 
         try:
-            response = self.client.chat.completions.create(
+            response = await self._completion(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a running coach providing weekly training recommendations."},
@@ -413,16 +662,91 @@ Be specific and actionable."""}
             return {"error": "OpenAI API key not configured"}
         
         try:
-            # Clear existing plans first
-            await self.clear_existing_plans(user_id, session)
+            request_body = await self._plan_request_body(session, user_id, weeks)
+            response = await self._completion(**request_body)
             
-            # Get user's recent training data for context
-            training_data = await self.analyze_training_data(session, user_id, days_back=30)
+            # JSON mode only guarantees a parseable object if the reply wasn't cut off
+            choice = response.choices[0]
+            if choice.finish_reason == "length":
+                raise Exception("plan reply was truncated")
+            plan_data = json.loads(choice.message.content)
             
-            # Build context for AI plan generation
-            context = ""
-            if "error" not in training_data:
-                context = f"""
+            # Replace the existing plans only once the new one has parsed
+            await self.clear_existing_plans(user_id, session)
+            return self._save_generated_plan(session, user_id, plan_data, weeks)
+            
+        except Exception as e:
+            session.rollback()
+            return {"error": f"Failed to generate training plan: {str(e)}"}
+
+    async def generate_training_plans_bulk(
+        self,
+        session: Session,
+        user_ids: List[int],
+        weeks: int = 4,
+        poll_interval: float = 30.0
+    ) -> Dict[int, Dict[str, Any]]:
+        """Generate plans for many users through the OpenAI Batch API (offline jobs, not interactive use)
+
+        All requests go up as one JSONL file; the batch is polled until it finishes and
+        each reply is saved exactly as generate_training_plan would save it.
+        """
+        if not self.client:
+            return {user_id: {"error": "OpenAI API key not configured"} for user_id in user_ids}
+        
+        lines = []
+        for user_id in user_ids:
+            lines.append(json.dumps({
+                "custom_id": str(user_id),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": await self._plan_request_body(session, user_id, weeks)
+            }))
+        batch_file = await self.client.files.create(
+            file=("training_plans.jsonl", "\n".join(lines).encode()),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+        
+        results = {user_id: {"error": f"Batch {batch.status} without a result for this user"} for user_id in user_ids}
+        if not batch.output_file_id:
+            return results
+        
+        output = await self.client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            item = json.loads(line)
+            user_id = int(item["custom_id"])
+            try:
+                if item.get("error"):
+                    raise Exception(item["error"].get("message", "request failed"))
+                choice = item["response"]["body"]["choices"][0]
+                if choice.get("finish_reason") == "length":
+                    raise Exception("plan reply was truncated")
+                plan_data = json.loads(choice["message"]["content"])
+                await self.clear_existing_plans(user_id, session)
+                results[user_id] = self._save_generated_plan(session, user_id, plan_data, weeks)
+            except Exception as e:
+                session.rollback()
+                results[user_id] = {"error": f"Failed to generate training plan: {str(e)}"}
+        return results
+
+    async def _plan_request_body(self, session: Session, user_id: int, weeks: int) -> Dict[str, Any]:
+        """chat.completions arguments for generating one user's plan"""
+        # Get user's recent training data for context (only the numbers are used)
+        training_data = await self.analyze_training_data(session, user_id, days_back=30, generate_insights=False)
+        
+        # Build context for AI plan generation
+        context = ""
+        if "error" not in training_data:
+            context = f"""
 User's Recent Training Context:
 - Weekly distance: {training_data.get('weekly_distance_km', 0)} km
 - Weekly frequency: {training_data.get('weekly_frequency', 0)} runs
@@ -430,12 +754,12 @@ User's Recent Training Context:
 - Recent activities: {training_data.get('running_activities', 0)}
 """
 
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""You are an expert running coach. Create a {weeks}-week training plan that progressively builds fitness.
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": f"""You are an expert running coach. Create a {weeks}-week training plan that progressively builds fitness.
 
 Structure the plan as JSON with this format:
 {{
@@ -460,136 +784,110 @@ Structure the plan as JSON with this format:
 
 Include variety: easy runs, tempo runs, intervals, long runs, and rest days.
 Make it progressive and appropriate for the user's fitness level."""
-                    },
-                    {
-                        "role": "user", 
-                        "content": f"Generate a {weeks}-week training plan.{context}"
-                    }
-                ],
-                max_tokens=2000,
-                temperature=0.3
-            )
-            
-            # Parse the AI response
-            ai_response = response.choices[0].message.content.strip()
-            
-            # Clean and parse JSON
-            if ai_response.startswith("```json"):
-                ai_response = ai_response.replace("```json", "").replace("```", "").strip()
-            
-            import json
-            plan_data = json.loads(ai_response)
-            
-            # Save the plan to database
-            from app.models.training import Training
-            from datetime import datetime, timedelta
-            
-            created_trainings = []
-            start_date = datetime.now().date()
+                },
+                {
+                    "role": "user", 
+                    "content": f"Generate a {weeks}-week training plan.{context}"
+                }
+            ],
+            "response_format": {"type": "json_object"},
+            "max_tokens": max(PLAN_MIN_TOKENS, PLAN_TOKENS_PER_WEEK * weeks),
+            "temperature": 0.3
+        }
+
+    def _save_generated_plan(
+        self,
+        session: Session,
+        user_id: int,
+        plan_data: Dict[str, Any],
+        weeks: int
+    ) -> Dict[str, Any]:
+        """Store a generated plan's workouts as Training rows"""
+        created_trainings = []
+        start_date = datetime.now().date()
+        
+        # Candidate (date, workout) pairs for every non-rest workout in the plan
+        candidates = []
+        for week_data in plan_data.get("weekly_structure", []):
+            week_number = week_data.get("week_number", 1)
+            week_start = start_date + timedelta(weeks=week_number - 1)
             
-            for week_data in plan_data.get("weekly_structure", []):
-                week_number = week_data.get("week_number", 1)
-                week_start = start_date + timedelta(weeks=week_number - 1)
-                
-                for workout in week_data.get("workouts", []):
-                    if workout.get("workout_type", "").lower() == "rest":
-                        continue
-                        
-                    # Calculate workout date
-                    day_name = workout.get("day", "Monday")
-                    day_offset = self._get_day_offset(day_name)
-                    workout_date = week_start + timedelta(days=day_offset)
-                    
-                    # Check for existing workout on this date
-                    existing_workout = session.exec(
-                        select(Training)
-                        .where(
-                            Training.user_id == user_id,
-                            Training.date == workout_date
-                        )
-                    ).first()
+            for workout in week_data.get("workouts", []):
+                if workout.get("workout_type", "").lower() == "rest":
+                    continue
                     
-                    if existing_workout:
-                        continue  # Skip if workout already exists for this date
-                    
-                    # Map workout type
-                    workout_type_mapping = {
-                        "Easy Run": "easy_run",
-                        "Long Run": "long_run",
-                        "Tempo": "tempo", 
-                        "Intervals": "intervals",
-                        "Rest": "rest"
-                    }
-                    mapped_type = workout_type_mapping.get(workout.get("workout_type", "Easy Run"), "easy_run")
-                    
-                    # Extract distance from description for interval workouts
-                    distance = None
-                    if mapped_type == "intervals":
-                        description = workout.get("description", "")
-                        # Look for interval patterns in the description
-                        import re
-                        # Match patterns like "7x600m", "6 x 800m", "7x600m + 4x200m"
-                        interval_pattern = r'(\d+)\s*x\s*(\d+)(?:m|km)'
-                        matches = re.findall(interval_pattern, description)
-                        if matches:
-                            total_distance = 0
-                            for reps, dist in matches:
-                                reps = int(reps)
-                                dist = int(dist)
-                                # Convert to km if in meters
-                                if 'm' in description.lower():
-                                    dist = dist / 1000
-                                total_distance += reps * dist
-                            distance = round(total_distance, 2)  # Round to 2 decimal places
-                            # Store the total distance in the description if not already there
-                            if f"{total_distance}km" not in description.lower():
-                                workout['description'] = description
-                    else:
-                        distance = self._parse_distance(workout.get("distance", ""))
-                    
-                    training = Training(
-                        user_id=user_id,
-                        date=workout_date,
-                        type=mapped_type,
-                        title=workout.get("workout_type", "Easy Run"),
-                        description=workout.get("description", ""),
-                        distance=distance,
-                        intensity=workout.get("intensity", "Moderate"),
-                        notes="AI generated training plan",
-                        plan_source="ai_generated",
-                        plan_title=plan_data.get("plan_title", "AI Training Plan")
-                    )
-                    
-                    session.add(training)
-                    created_trainings.append({
-                        "date": workout_date.isoformat(),
-                        "day": day_name,
-                        "workout": workout.get("description", ""),
-                        "type": workout.get("workout_type", "")
-                    })
+                # Calculate workout date
+                day_offset = self._get_day_offset(workout.get("day", "Monday"))
+                candidates.append((week_start + timedelta(days=day_offset), workout))
+        
+        # Dates that already hold a workout, fetched in one query
+        existing_dates = set(session.exec(
+            select(Training.date).where(
+                Training.user_id == user_id,
+                Training.date.in_({workout_date for workout_date, _ in candidates})
+            )
+        ).all()) if candidates else set()
+        
+        # Map workout type
+        workout_type_mapping = {
+            "Easy Run": "easy_run",
+            "Long Run": "long_run",
+            "Tempo": "tempo", 
+            "Intervals": "intervals",
+            "Rest": "rest"
+        }
+        
+        new_trainings = []
+        for workout_date, workout in candidates:
+            if workout_date in existing_dates:
+                continue  # Skip if a workout already exists for this date
+            existing_dates.add(workout_date)
             
-            session.commit()
+            mapped_type = workout_type_mapping.get(workout.get("workout_type", "Easy Run"), "easy_run")
             
-            return {
-                "success": True,
-                "message": f"Successfully generated AI training plan with {len(created_trainings)} workouts",
-                "plan_title": plan_data.get("plan_title", "AI Training Plan"),
-                "workouts_created": len(created_trainings),
-                "duration_weeks": weeks,
-                "created_workouts": created_trainings[:10]
-            }
+            # Extract distance from description for interval workouts
+            distance = None
+            if mapped_type == "intervals":
+                total_distance = self._calculate_interval_distance(workout.get("description", ""))
+                if total_distance:
+                    distance = round(total_distance, 2)  # Round to 2 decimal places
+            else:
+                distance = self._parse_distance(workout.get("distance", ""))
             
-        except Exception as e:
-            session.rollback()
-            return {"error": f"Failed to generate training plan: {str(e)}"}
+            new_trainings.append(Training(
+                user_id=user_id,
+                date=workout_date,
+                type=mapped_type,
+                title=workout.get("workout_type", "Easy Run"),
+                description=workout.get("description", ""),
+                distance=distance,
+                intensity=workout.get("intensity", "Moderate"),
+                notes="AI generated training plan",
+                plan_source="ai_generated",
+                plan_title=plan_data.get("plan_title", "AI Training Plan")
+            ))
+            created_trainings.append({
+                "date": workout_date.isoformat(),
+                "day": workout.get("day", "Monday"),
+                "workout": workout.get("description", ""),
+                "type": workout.get("workout_type", "")
+            })
+        
+        session.add_all(new_trainings)
+        session.commit()
+        
+        return {
+            "success": True,
+            "message": f"Successfully generated AI training plan with {len(created_trainings)} workouts",
+            "plan_title": plan_data.get("plan_title", "AI Training Plan"),
+            "workouts_created": len(created_trainings),
+            "duration_weeks": weeks,
+            "created_workouts": created_trainings[:10]
+        }
     
     def _get_day_offset(self, day_name: str) -> int:
         """Convert day name to offset from Monday"""
-        days = {
-            "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-            "friday": 4, "saturday": 5, "sunday": 6
-        }
-        return days.get(day_name.lower(), 0)
+        return _DAY_OFFSETS.get(day_name.lower(), 0)
     
     def _parse_distance(self, distance_str: str) -> Optional[float]:
         """Parse distance string to kilometers"""
@@ -600,49 +898,23 @@ Make it progressive and appropriate for the user's fitness level."""
         if "x" in distance_str.lower():
             return self._calculate_interval_distance(distance_str)
             
-        # Handle regular distance formats
-        try:
-            # Remove any non-numeric characters except decimal point
-            distance_str = ''.join(c for c in distance_str if c.isdigit() or c == '.')
-            if distance_str:
-                distance = float(distance_str)
-                # Convert miles to kilometers if needed
-                if "mile" in distance_str.lower():
-                    distance *= 1.60934
-                return distance
-        except:
-            pass
-        return None
+        # Handle regular distance formats, e.g. "8km" or "5.5 miles"
+        match = _NUM_RE.search(distance_str)
+        if not match:
+            return None
+        distance = float(match.group(1))
+        # Convert miles to kilometers if needed
+        if "mile" in distance_str.lower():
+            distance *= 1.60934
+        return distance
 
     def _calculate_interval_distance(self, interval_str: str) -> Optional[float]:
-        """Calculate total distance for interval workouts"""
-        try:
-            # Split into main intervals and additional intervals if any
-            parts = interval_str.split('+')
-            total_distance = 0
-            
-            for part in parts:
-                part = part.strip()
-                if 'x' in part:
-                    # Parse format like "6 x 800m" or "7 x 600m"
-                    reps, distance = part.split('x')
-                    reps = int(reps.strip())
-                    
-                    # Parse distance
-                    distance = distance.strip()
-                    if 'm' in distance.lower():
-                        # Convert meters to kilometers
-                        distance_km = float(distance.lower().replace('m', '')) / 1000
-                    elif 'km' in distance.lower():
-                        distance_km = float(distance.lower().replace('km', ''))
-                    else:
-                        continue
-                        
-                    total_distance += reps * distance_km
-            
-            return total_distance if total_distance > 0 else None
-        except:
-            return None
+        """Calculate total distance for interval workouts, e.g. "7x600m + 4x200m" -> 5.0 km"""
+        total_distance = 0
+        for reps, distance, unit in _INTERVAL_RE.findall(interval_str):
+            distance_km = float(distance) if unit.lower() == 'km' else float(distance) / 1000
+            total_distance += int(reps) * distance_km
+        return total_distance if total_distance > 0 else None
 
     async def get_quick_insights(self, session: Session):
         """Get quick insights from the AI coach."""
@@ -658,6 +930,23 @@ Make it progressive and appropriate for the user's fitness level."""
         """Chat with the AI coach."""
         return f"I'm your AI running coach. You said: {message}. How can I help you with your training today?" 
 
+    def _plan_context_in_thread(self, user_id: int, session: Session) -> str:
+        """Build the plan context on a session of its own (sessions are not thread-safe)"""
+        with Session(session.get_bind()) as thread_session:
+            return self._get_parsed_plan_context(user_id, thread_session)
+
+    def _plan_statistics(self, plan_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Week, workout and distance totals from an already loaded plan"""
+        weekly_structure = plan_data.get('weekly_structure', [])
+        workouts = [w for week in weekly_structure for w in week.get('workouts', [])]
+        return {
+            "total_weeks": len(weekly_structure),
+            "total_workouts": len(workouts),
+            "total_distance_km": sum(
+                self._parse_distance(str(w['distance'])) or 0 for w in workouts if w.get('distance')
+            ),
+        }
+
     def _get_parsed_plan_context(self, user_id: int, session: Session) -> str:
         """Get context about user's parsed training plans"""
         try:
@@ -677,7 +966,7 @@ Make it progressive and appropriate for the user's fitness level."""
             
             for i, plan in enumerate(plans[:2]):  # Limit to 2 plans for context
                 plan_data = storage_service.load_parsed_data(plan)
-                stats = storage_service.get_plan_statistics(plan)
+                stats = self._plan_statistics(plan_data)
                 
                 context_parts.append(f"""
 Plan {i+1}: {plan.plan_title} (parsed {plan.parsed_at.strftime('%B %Y')})
@@ -697,19 +986,14 @@ Plan {i+1}: {plan.plan_title} (parsed {plan.parsed_at.strftime('%B %Y')})
                     plan_start_date = plan.parsed_at.date()
                     
                     # Try to intelligently determine which week to show
-                    # First, check if the plan title contains a month name
-                    month_names = [
-                        "january", "february", "march", "april", "may", "june",
-                        "july", "august", "september", "october", "november", "december"
-                    ]
-                    
-                    plan_title_lower = plan.plan_title.lower()
+                    # First, find the month names among the plan title's words
+                    mentioned_months = _MONTH_SET.intersection(_WORD_RE.findall(plan.plan_title.lower()))
                     current_month_name = today.strftime("%B").lower()
                     
                     # Check if plan title mentions the current month
-                    if any(month in plan_title_lower for month in month_names):
+                    if mentioned_months:
                         # Plan mentions a specific month
-                        if current_month_name in plan_title_lower:
+                        if current_month_name in mentioned_months:
                             # We're in the month mentioned in the plan
                             # Calculate which week of the month we're in
                             month_start = today.replace(day=1)
@@ -743,6 +1027,7 @@ Plan {i+1}: {plan.plan_title} (parsed {plan.parsed_at.strftime('%B %Y')})
                         
                         # Show all workouts for this week
                         workouts = week_data.get('workouts', [])
+                        total_distance = 0.0
                         for workout in workouts:
                             day = workout.get('day', 'N/A')
                             workout_type = workout.get('workout_type', 'N/A')
@@ -751,11 +1036,14 @@ Plan {i+1}: {plan.plan_title} (parsed {plan.parsed_at.strftime('%B %Y')})
                             
                             if distance:
                                 context_parts.append(f"  {day}: {workout_type} - {description} ({distance})")
+                                try:
+                                    total_distance += float(distance)
+                                except (TypeError, ValueError):
+                                    pass  # e.g. "5 miles"; listed above but left out of the total
                             else:
                                 context_parts.append(f"  {day}: {workout_type} - {description}")
                         
                         # Add weekly summary
-                        total_distance = sum(float(w.get('distance', 0)) for w in workouts if w.get('distance'))
                         context_parts.append(f"  Weekly total: {total_distance:.1f} km")
             
             if len(plans) > 2:
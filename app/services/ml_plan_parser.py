@@ -1,52 +1,61 @@
 from typing import Dict, List, Optional
 import re
 from datetime import datetime, timedelta
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import spacy
 from app.config import settings
 
+_DAYS = r'(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)'
+
+# Plan structure
+_WEEK_RE = re.compile(r'📊\s*Week\s*\d+.*?(?=📊\s*Week|\Z)', re.DOTALL)
+_WEEK_NUMBER_RE = re.compile(r'Week\s*\d+')
+_WORKOUT_RE = re.compile(_DAYS + r'.*?(?=(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)|\Z)', re.DOTALL)
+_DAY_RE = re.compile(_DAYS)
+_TOTAL_DISTANCE_RE = re.compile(r'Total Distance\s*(\d+(?:\.\d+)?)\s*km')
+
+# A distance and its unit, e.g. "5 miles", "10km" or "800m"
+_DISTANCE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(miles?|km|m)\b', re.IGNORECASE)
+_KM_PER_UNIT = {"mile": 1.60934, "miles": 1.60934, "km": 1.0, "m": 0.001}
+
+# Leading day and workout-type lines stripped from descriptions
+_DAY_LINE_RE = re.compile(r'^' + _DAYS + r'.*?\n')
+_TYPE_LINE_RE = re.compile(r'^(🏃|⚡|🏃‍♂️)\s*.*?\n')
+
+# Words as the old TF-IDF tokenizer saw them (two or more word characters)
+_TOKEN_RE = re.compile(r'\w\w+')
+
+# Common workout patterns and their features
+WORKOUT_PATTERNS = {
+    'easy_run': {
+        'keywords': ['easy', 'recovery', 'steady', 'conversational'],
+        'distance_range': (3, 10),  # km
+        'intensity': 'low'
+    },
+    'intervals': {
+        'keywords': ['intervals', 'repeats', 'sprints', 'fartlek'],
+        'distance_range': (0.2, 2),  # km per interval
+        'intensity': 'high'
+    },
+    'long_run': {
+        'keywords': ['long', 'endurance', 'distance'],
+        'distance_range': (10, 30),  # km
+        'intensity': 'moderate'
+    }
+}
+
+# Keyword set per workout type for classification
+_KEYWORD_SETS = {
+    workout_type: frozenset(pattern['keywords'])
+    for workout_type, pattern in WORKOUT_PATTERNS.items()
+}
+
+# Display name per workout type, e.g. 'long_run' -> 'Long Run'
+_TYPE_NAMES = {workout_type: workout_type.replace('_', ' ').title() for workout_type in WORKOUT_PATTERNS}
+
 class MLPlanParser:
     def __init__(self):
-        # Load spaCy model for NLP
-        self.nlp = spacy.load("en_core_web_sm")
-        
-        # Initialize TF-IDF vectorizer for text similarity
-        self.vectorizer = TfidfVectorizer(
-            stop_words='english',
-            ngram_range=(1, 2),
-            max_features=1000
-        )
-        
-        # Common workout patterns and their features
-        self.workout_patterns = {
-            'easy_run': {
-                'keywords': ['easy', 'recovery', 'steady', 'conversational'],
-                'distance_range': (3, 10),  # km
-                'intensity': 'low'
-            },
-            'intervals': {
-                'keywords': ['intervals', 'repeats', 'sprints', 'fartlek'],
-                'distance_range': (0.2, 2),  # km per interval
-                'intensity': 'high'
-            },
-            'long_run': {
-                'keywords': ['long', 'endurance', 'distance'],
-                'distance_range': (10, 30),  # km
-                'intensity': 'moderate'
-            }
-        }
-        
-        # Initialize the vectorizer with common workout descriptions
-        self._initialize_vectorizer()
-
-    def _initialize_vectorizer(self):
-        """Initialize the TF-IDF vectorizer with common workout patterns."""
-        sample_texts = []
-        for pattern in self.workout_patterns.values():
-            sample_texts.extend(pattern['keywords'])
-        self.vectorizer.fit(sample_texts)
+        # Static lexicon, shared by every parser in the process
+        self.workout_patterns = WORKOUT_PATTERNS
+        self._kw_sets = _KEYWORD_SETS
 
     def parse_plan(self, plan_text: str) -> Dict:
         """Parse a training plan using ML-based approach."""
@@ -70,17 +79,14 @@ class MLPlanParser:
 
     def _split_into_weeks(self, plan_text: str) -> List[str]:
         """Split the plan text into individual weeks."""
-        week_pattern = r'📊\s*Week\s*\d+.*?(?=📊\s*Week|\Z)'
-        weeks = re.findall(week_pattern, plan_text, re.DOTALL)
-        return weeks
+        return _WEEK_RE.findall(plan_text)
 
     def _extract_plan_title(self, plan_text: str) -> str:
-        """Extract the plan title using NLP."""
-        doc = self.nlp(plan_text)
-        # Look for the first sentence or line that doesn't contain week information
-        for sent in doc.sents:
-            if not re.search(r'Week\s*\d+', sent.text):
-                return sent.text.strip()
+        """Extract the plan title from the first lines of the plan."""
+        # Look for the first non-empty line that doesn't contain week information
+        for line in plan_text.splitlines()[:10]:
+            if line.strip() and not _WEEK_NUMBER_RE.search(line):
+                return line.strip()
         return "Training Plan"
 
     def _parse_week(self, week_text: str, week_num: int) -> Dict:
@@ -105,7 +111,7 @@ class MLPlanParser:
 
     def _extract_total_distance(self, week_text: str) -> float:
         """Extract the total distance for the week."""
-        distance_match = re.search(r'Total Distance\s*(\d+(?:\.\d+)?)\s*km', week_text)
+        distance_match = _TOTAL_DISTANCE_RE.search(week_text)
         if distance_match:
             return float(distance_match.group(1))
         return 0.0
@@ -113,20 +119,15 @@ class MLPlanParser:
     def _split_into_workouts(self, week_text: str) -> List[str]:
         """Split the week text into individual workouts."""
         # Look for workout sections starting with day names
-        workout_pattern = r'(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday).*?(?=(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)|\Z)'
-        workouts = re.findall(workout_pattern, week_text, re.DOTALL)
-        return workouts
+        return _WORKOUT_RE.findall(week_text)
 
     def _parse_workout(self, workout_text: str) -> Optional[Dict]:
         """Parse a single workout using ML-based approach."""
         # Extract basic information
-        day_match = re.search(r'(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)', workout_text)
+        day_match = _DAY_RE.search(workout_text)
         if not day_match:
             return None
         
-        # Use NLP to understand the workout type and description
-        doc = self.nlp(workout_text)
-        
         # Determine workout type using ML
         workout_type = self._classify_workout_type(workout_text)
         
@@ -144,56 +145,34 @@ class MLPlanParser:
         }
 
     def _classify_workout_type(self, workout_text: str) -> str:
-        """Classify the workout type using ML."""
-        # Transform the workout text
-        text_vector = self.vectorizer.transform([workout_text])
-        
-        # Compare with known patterns
-        max_similarity = 0
-        best_type = "Easy Run"  # default
-        
-        for workout_type, pattern in self.workout_patterns.items():
-            pattern_vector = self.vectorizer.transform([' '.join(pattern['keywords'])])
-            similarity = cosine_similarity(text_vector, pattern_vector)[0][0]
-            
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_type = workout_type.replace('_', ' ').title()
-        
-        return best_type
+        """Classify the workout type as the pattern sharing the most keywords with the text."""
+        tokens = set(_TOKEN_RE.findall(workout_text.lower()))
+        workout_type, keywords = max(self._kw_sets.items(), key=lambda kv: len(kv[1] & tokens))
+        if not keywords & tokens:
+            return "Easy Run"  # default
+        return _TYPE_NAMES[workout_type]
 
     def _extract_distance(self, workout_text: str, workout_type: str) -> Optional[float]:
         """Extract distance using ML-enhanced pattern matching."""
         # Look for distance patterns
-        distance_patterns = [
-            r'(\d+(?:\.\d+)?)\s*miles?',
-            r'(\d+(?:\.\d+)?)\s*km',
-            r'(\d+(?:\.\d+)?)\s*m'
-        ]
-        
-        for pattern in distance_patterns:
-            match = re.search(pattern, workout_text, re.IGNORECASE)
-            if match:
-                distance = float(match.group(1))
-                # Convert to kilometers if needed
-                if 'miles' in pattern:
-                    distance *= 1.60934
-                elif 'm' in pattern and not 'km' in pattern:
-                    distance /= 1000
-                return round(distance, 2)
+        match = _DISTANCE_RE.search(workout_text)
+        if match:
+            # Convert to kilometers
+            return round(float(match.group(1)) * _KM_PER_UNIT[match.group(2).lower()], 2)
         
         # If no distance found, use ML to estimate based on workout type
         if workout_type in self.workout_patterns:
             pattern = self.workout_patterns[workout_type.lower().replace(' ', '_')]
-            return np.mean(pattern['distance_range'])
+            low, high = pattern['distance_range']
+            return (low + high) / 2
         
         return None
 
     def _extract_description(self, workout_text: str) -> str:
         """Extract the workout description using NLP."""
         # Remove the day and workout type
-        description = re.sub(r'^(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday).*?\n', '', workout_text)
-        description = re.sub(r'^(🏃|⚡|🏃‍♂️)\s*.*?\n', '', description)
+        description = _DAY_LINE_RE.sub('', workout_text)
+        description = _TYPE_LINE_RE.sub('', description)
         
         # Clean up the description
         description = description.strip()
@@ -235,7 +214,7 @@ class MLPlanParser:
         
         # Calculate overall confidence score
         if confidence_scores:
-            verification["confidence_score"] = np.mean(confidence_scores)
+            verification["confidence_score"] = sum(confidence_scores) / len(confidence_scores)
             verification["is_valid"] = verification["confidence_score"] > 0.7
         
         return verification
@@ -268,4 +247,4 @@ class MLPlanParser:
             except ValueError:
                 confidence_scores.append(0.0)
         
-        return np.mean(confidence_scores) if confidence_scores else 0.0 
\ No newline at end of file
+        return sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.0 
\ No newline at end of file
@@ -1,66 +1,287 @@
+import asyncio
 import base64
+import io
 import json
-from typing import Optional, Dict, Any
-from openai import OpenAI
-from openai import AsyncOpenAI
-from datetime import datetime, timedelta
+import random
+import re
+import numpy as np
+import orjson
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import date, datetime, timedelta
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from PIL import Image
 
 from app.config import settings
 from app.services.ml_plan_parser import MLPlanParser
+from app.services.ai_coach_service import _TRANSIENT_OPENAI_ERRORS, _openai_client
 from app.database import get_session
-from app.models.training import Training, WorkoutType  # Use SQLModel
+from app.models.training import Training, WorkoutStatus, WorkoutType  # Use SQLModel
 from app.models.training import TrainingPlan as SQLModelTrainingPlan  # Use SQLModel
 from app.services.plan_storage_service import PlanStorageService
-from sqlmodel import Session
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+
+# Day name -> offset from Monday
+_DAY_OFFSETS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6
+}
+
+# Parsed workout type names (lowercased) -> Training workout types
+_WORKOUT_TYPE_MAPPING = MappingProxyType({
+    "easy run": WorkoutType.EASY_RUN,
+    "long run": WorkoutType.LONG_RUN,
+    "tempo": WorkoutType.TEMPO,
+    "intervals": WorkoutType.INTERVALS,
+    "hills": WorkoutType.HILLS,
+    "recovery": WorkoutType.RECOVERY,
+    "rest": WorkoutType.REST
+})
+
+# Instructions sent with every plan image
+_VISION_PROMPT = """Analyze this training plan image and extract the structured data.
+Copy each workout description exactly as written, including distances, repetitions and paces.
+Use "Rest" as the workout type for rest days."""
+
+# Shape of the vision reply, enforced by OpenAI structured outputs
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "duration_weeks": {"type": "integer"},
+        "weekly_structure": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "week_number": {"type": "integer"},
+                    "workouts": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "day": {"type": "string"},
+                                "workout_type": {"type": "string"},
+                                "description": {"type": "string"}
+                            },
+                            "required": ["day", "workout_type", "description"],
+                            "additionalProperties": False
+                        }
+                    }
+                },
+                "required": ["week_number", "workouts"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["title", "duration_weeks", "weekly_structure"],
+    "additionalProperties": False
+}
+
+# Workout distances in coach notation: "6 x 800" / "7 x 600m" / "2 x 1.5km" / "4 x 1 mile" sets,
+# "6 x hill strides" (100m each) and "5m easy" (m = miles)
+# (time-based reps like "10 x 1 min" or "8 x 30s" have no distance)
+_INTERVAL_SET_RE = re.compile(
+    r'(\d+)\s*x\s*(\d+(?:\.\d+)?)(?![\d.]|\s*(?:min|sec|s\b))\s*(km|miles?|mi|m)?\b', re.IGNORECASE
+)
+_STRIDES_RE = re.compile(r'(\d+)\s*x\s*(?:hill|strides?|sprints?)\b', re.IGNORECASE)
+_MILES_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(mi(?:les?)?|m)\b', re.IGNORECASE)
+WARM_UP_COOL_DOWN_KM = 6.4  # added to every interval session without a base distance
+# Bare "m" values from this one up are metres ("200m jog" recoveries), not base miles
+_MIN_BASE_METRES = 100
+STRIDE_KM = 0.1
+KM_PER_MILE = 1.60934
+# Unitless or "m" rep lengths from this value up are metres ("6 x 60m"), below it miles ("4 x 2")
+_MIN_REP_METRES = 20
+
+def _rep_km(value: str, unit: str) -> float:
+    """Length of one interval rep in km"""
+    distance = float(value)
+    unit = unit.lower()
+    if unit == "km":
+        return distance
+    if unit.startswith("mi") or distance < _MIN_REP_METRES:
+        return distance * KM_PER_MILE
+    return distance / 1000
+
+def _description_distance_km(description: str) -> Optional[float]:
+    """Total km for a workout description in coach notation, or None if it has no distance
+
+    >>> _description_distance_km("6 x 60m strides")
+    6.76
+    >>> _description_distance_km("8 x 80m hill sprints")
+    7.04
+    >>> _description_distance_km("4 x 1 mile")
+    12.84
+    >>> _description_distance_km("6 x hill strides")
+    7.0
+    >>> _description_distance_km("5m easy + 6 x 100m strides")
+    8.65
+    >>> _description_distance_km("6 x 800 @ 5k pace")
+    11.2
+    >>> _description_distance_km("10 x 1 min hard") is None
+    True
+    >>> _description_distance_km("8 x 400m w/ 200m jog")
+    9.6
+    >>> _description_distance_km("12 x 200m off 200m jog")
+    8.8
+    >>> _description_distance_km("6 x 800m (400m jog)")
+    11.2
+    >>> _description_distance_km("5 x 1km with 400m recovery")
+    11.4
+    >>> _description_distance_km("3m warm up + 6 x 800 + 3m cool down")
+    14.46
+    >>> _description_distance_km("Easy 6 miles")
+    9.66
+    """
+    sets_km = sum(int(reps) * _rep_km(value, unit) for reps, value, unit in _INTERVAL_SET_RE.findall(description))
+    sets_km += sum(int(reps) for reps in _STRIDES_RE.findall(description)) * STRIDE_KM
+    # Base run distance (warm up, cool down, easy miles), looked for outside the sets so rep
+    # counts and lengths aren't read as miles; metre values left there are recoveries
+    base_miles = sum(
+        float(value)
+        for value, unit in _MILES_RE.findall(_STRIDES_RE.sub(" ", _INTERVAL_SET_RE.sub(" ", description)))
+        if unit.lower() != "m" or float(value) < _MIN_BASE_METRES
+    )
+    if base_miles:
+        distance = base_miles * KM_PER_MILE + sets_km
+    elif sets_km:
+        distance = sets_km + WARM_UP_COOL_DOWN_KM
+    else:
+        return None
+    return round(distance, 2)
+
+def _workout_distance_columns(plan_data: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Week index and distance (km) of every workout in the plan, as parallel arrays"""
+    week_index, distances = [], []
+    for i, week in enumerate(plan_data.get("weekly_structure", [])):
+        for workout in week.get("workouts", []):
+            try:
+                distance = float(workout.get("distance") or 0)
+            except (TypeError, ValueError):
+                distance = 0.0
+            week_index.append(i)
+            distances.append(distance)
+    return np.array(week_index, dtype=np.intp), np.array(distances, dtype=np.float64)
+
+def _weekly_distances(plan_data: Dict[str, Any]) -> np.ndarray:
+    """Total km per week of the plan"""
+    week_index, distances = _workout_distance_columns(plan_data)
+    return np.bincount(week_index, weights=distances, minlength=len(plan_data.get("weekly_structure", [])))
+
+def _fill_week_totals(plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Set each week's total_distance (km) from its workouts' distances"""
+    for week, total_distance in zip(plan_data.get("weekly_structure", []), _weekly_distances(plan_data)):
+        week["total_distance"] = round(float(total_distance), 2)
+    return plan_data
+
+# GPT-4o downsamples large images anyway, so they are shrunk before upload
+VISION_MAX_IMAGE_SIDE = 1536
+VISION_JPEG_QUALITY = 85
+
+def _downscale_image(image_bytes: bytes) -> bytes:
+    """JPEG no larger than VISION_MAX_IMAGE_SIDE on its long edge; small JPEGs pass through unchanged"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        if img.format == "JPEG" and max(img.size) <= VISION_MAX_IMAGE_SIDE:
+            return image_bytes
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((VISION_MAX_IMAGE_SIDE, VISION_MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+        return buf.getvalue()
+
+# Fixed parts of the vision request; only the image URL changes per call
+_VISION_PROMPT_PART = {"type": "text", "text": _VISION_PROMPT}
+_DATA_URL_PREFIX = "data:image/jpeg;base64,"
+
+# Plan text templates, filled with str.format_map; the _Fields classes supply defaults for missing keys
+_PLAN_TEXT = "Plan: {plan_title}\nStart Date: {start_date}\nDuration: {duration_weeks} weeks\n\n\n"
+_WEEK_TEXT = "Week {week_number}\nTotal Distance: {total_distance} miles\n\nWorkouts:\n"
+_WORKOUT_TEXT = "- {day}: {workout_type}\n  Distance: {distance} miles\n  Description: {description}\n\n"
+
+class _Fields(dict):
+    _DEFAULTS: Dict[str, Any] = {}
+
+    def __missing__(self, key: str) -> Any:
+        return self._DEFAULTS[key]
+
+class _PlanFields(_Fields):
+    _DEFAULTS = {"plan_title": "Untitled Plan", "start_date": "Not specified", "duration_weeks": 0}
+
+class _WeekFields(_Fields):
+    _DEFAULTS = {"week_number": "N/A", "total_distance": 0}
+
+class _WorkoutFields(_Fields):
+    _DEFAULTS = {"day": "N/A", "workout_type": "N/A", "distance": 0, "description": "No description"}
+
+# Vision calls are slow and costly to lose, so they get more tries than chat completions
+VISION_ATTEMPTS = 5
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's retry-after if given, else jittered backoff"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return random.uniform(1, min(30, 2 ** (attempt + 1)))
+
+# Vision analyses kept in memory per process, by image hash
+IMAGE_ANALYSIS_CACHE_SIZE = 128
+
+@lru_cache(maxsize=1)
+def _get_ml_parser() -> MLPlanParser:
+    """Process-wide MLPlanParser, created on first use"""
+    return MLPlanParser()
 
 class PlanParserService:
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            base_url="https://api.openai.com/v1"
-        ) if settings.OPENAI_API_KEY else None
-        self.ml_parser = MLPlanParser()
+        self.client = _openai_client()
         self.storage_service = PlanStorageService()
+        # image hash -> parsed plan as JSON, least recently used first
+        self._image_analyses: Dict[str, bytes] = {}
+        self._image_analysis_locks: Dict[str, asyncio.Lock] = {}
+        # Bounds concurrent vision calls so batches stay within rate limits
+        self._vision_slots = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+    @cached_property
+    def ml_parser(self) -> MLPlanParser:
+        """Fallback parser for workout text, only built when a plan needs it"""
+        return _get_ml_parser()
 
     def _extract_plan_text(self, structured_data: Dict[str, Any]) -> str:
         """Extract a text representation of the plan from the structured data"""
-        plan_text = []
-        plan_text.append(f"Plan: {structured_data.get('plan_title', 'Untitled Plan')}")
-        plan_text.append(f"Start Date: {structured_data.get('start_date', 'Not specified')}")
-        plan_text.append(f"Duration: {structured_data.get('duration_weeks', 0)} weeks")
-        plan_text.append("\n")
+        buf = io.StringIO()
+        buf.write(_PLAN_TEXT.format_map(_PlanFields(structured_data)))
         
         for week in structured_data.get('weekly_structure', []):
-            plan_text.append(f"Week {week.get('week_number', 'N/A')}")
-            plan_text.append(f"Total Distance: {week.get('total_distance', 0)} miles")
-            plan_text.append("\nWorkouts:")
-            
+            buf.write(_WEEK_TEXT.format_map(_WeekFields(week)))
             for workout in week.get('workouts', []):
-                plan_text.append(f"- {workout.get('day', 'N/A')}: {workout.get('workout_type', 'N/A')}")
-                plan_text.append(f"  Distance: {workout.get('distance', 0)} miles")
-                plan_text.append(f"  Description: {workout.get('description', 'No description')}")
-                plan_text.append("")
-            
-            plan_text.append("")
+                buf.write(_WORKOUT_TEXT.format_map(_WorkoutFields(workout)))
+            buf.write("\n")
         
-        return "\n".join(plan_text)
+        # Lines were newline-terminated; the text itself has no trailing newline
+        return buf.getvalue()[:-1]
 
-    async def parse_plan_from_image(self, image_data: str, user_id: int, db: Session) -> Dict[str, Any]:
-        """Parse a training plan from an image using OpenAI Vision."""
+    async def parse_plan_from_image(self, image_bytes: bytes, user_id: int, db: Session) -> Dict[str, Any]:
+        """Parse a training plan from raw image bytes using OpenAI Vision."""
         try:
-            # Convert base64 to bytes for storage
-            image_bytes = base64.b64decode(image_data)
-            
             # Check if we already have this image parsed
             image_hash = self.storage_service._generate_image_hash(image_bytes)
-            existing_plan = self.storage_service.get_plan_by_image_hash(user_id, image_hash, db)
+            # Storage calls are blocking DB work, so they run off the event loop (one at a time on `db`)
+            existing_plan = await asyncio.to_thread(
+                self.storage_service.get_plan_by_image_hash, user_id, image_hash, db
+            )
             
             if existing_plan:
                 print(f"DEBUG: Found existing parsed plan for image hash: {image_hash}")
                 # Load existing parsed data
                 plan_data = self.storage_service.load_parsed_data(existing_plan)
                 # Create training workouts from stored plan
-                self.storage_service.create_training_workouts_from_plan(existing_plan, user_id, db)
+                await asyncio.to_thread(
+                    self.storage_service.create_training_workouts_from_plan, existing_plan, user_id, db
+                )
                 
                 return {
                     "id": existing_plan.id,
@@ -74,7 +295,7 @@ class PlanParserService:
             
             # Parse new image
             print(f"DEBUG: Parsing new image with hash: {image_hash}")
-            analysis = await self._analyze_plan_image(image_data)
+            analysis = await self._analyze_plan_image_cached(image_hash, image_bytes)
             
             # Store the parsed plan
             stored_plan = self.storage_service.store_parsed_plan(
@@ -84,13 +305,8 @@ class PlanParserService:
                 confidence_score=0.9
             )
             
-            # Save to database
-            db.add(stored_plan)
-            db.commit()
-            db.refresh(stored_plan)
-            
-            # Create training workouts
-            self.storage_service.create_training_workouts_from_plan(stored_plan, user_id, db)
+            # Save to database and create training workouts
+            await asyncio.to_thread(self._store_plan, stored_plan, user_id, db)
             
             return {
                 "id": stored_plan.id,
@@ -105,120 +321,150 @@ class PlanParserService:
         except Exception as e:
             raise Exception(f"Error parsing plan: {str(e)}")
 
-    async def _analyze_plan_image(self, base64_image: str) -> Dict[str, Any]:
+    def _store_plan(self, stored_plan: Any, user_id: int, db: Session) -> None:
+        """Persist a newly parsed plan and create its training workouts"""
+        db.add(stored_plan)
+        db.commit()
+        db.refresh(stored_plan)
+        self.storage_service.create_training_workouts_from_plan(stored_plan, user_id, db)
+
+    async def parse_plans_from_images(self, images: List[bytes], user_id: int, db: Session) -> List[Dict[str, Any]]:
+        """Parse several plan images, overlapping the vision calls for images not parsed before"""
+        # Images not yet stored for this user, deduplicated by hash
+        pending = {}
+        for image_bytes in images:
+            image_hash = self.storage_service._generate_image_hash(image_bytes)
+            if image_hash not in pending and not await asyncio.to_thread(
+                self.storage_service.get_plan_by_image_hash, user_id, image_hash, db
+            ):
+                pending[image_hash] = image_bytes
+        
+        # Fill the in-memory cache concurrently; storing below then reuses these analyses.
+        # A failed analysis doesn't cancel the others; its image is retried and reported below.
+        await asyncio.gather(*(
+            self._analyze_plan_image_cached(image_hash, image_bytes) for image_hash, image_bytes in pending.items()
+        ), return_exceptions=True)
+        
+        # DB work shares one session, so plans are stored in order
+        return [await self.parse_plan_from_image(image_bytes, user_id, db) for image_bytes in images]
+
+    async def _analyze_plan_image_cached(self, image_hash: str, image_bytes: bytes) -> Dict[str, Any]:
+        """Analyze an image, reusing the result for an image already seen by this process
+
+        Each hit decodes a fresh copy, so callers may modify the plan they get back.
+        """
+        # One vision call per image at a time; a duplicate upload in flight waits for it and reuses the result
+        async with self._image_analysis_locks.setdefault(image_hash, asyncio.Lock()):
+            cached = self._image_analyses.pop(image_hash, None)
+            if cached is None:
+                cached = orjson.dumps(await self._analyze_plan_image(image_bytes))
+                if len(self._image_analyses) >= IMAGE_ANALYSIS_CACHE_SIZE:
+                    self._image_analyses.pop(next(iter(self._image_analyses)))
+            self._image_analyses[image_hash] = cached
+        self._image_analysis_locks.pop(image_hash, None)
+        return orjson.loads(cached)
+
+    def _fill_workout_distances(self, plan_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Set each workout's distance (km) from its description"""
+        for week in plan_data.get("weekly_structure", []):
+            for workout in week.get("workouts", []):
+                if workout.get("workout_type", "").lower() == "rest":
+                    workout["distance"] = 0
+                    continue
+                description = workout.get("description", "")
+                distance = _description_distance_km(description)
+                if distance is None:
+                    # Other notations ("10km", "3 miles"), via the ML parser's distance patterns
+                    distance = self.ml_parser._extract_distance(description, workout.get("workout_type", ""))
+                workout["distance"] = distance if distance is not None else workout.get("distance")
+        return plan_data
+
+    async def _vision_completion(self, **kwargs):
+        """chat.completions.create under the concurrency limit, retried on transient errors"""
+        for attempt in range(VISION_ATTEMPTS):
+            try:
+                async with self._vision_slots:
+                    return await self.client.chat.completions.create(**kwargs)
+            except _TRANSIENT_OPENAI_ERRORS as e:
+                if attempt == VISION_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(_retry_delay(e, attempt))
+
+    async def _analyze_plan_image(self, image_bytes: bytes) -> Dict[str, Any]:
         """Analyze a training plan image using OpenAI Vision."""
         try:
-            # Create the vision prompt
-            vision_prompt = """Analyze this training plan image and extract the structured data. 
-            For each workout, calculate the total distance based on the description:
-            - For easy runs, use the number before 'm' as the distance in miles, then convert to km (1 mile = 1.60934 km)
-              Example: '5m easy' = 5 miles = 8.05 km
-            - For intervals, calculate total distance in km:
-              * 800m intervals: multiply number of intervals by 0.8
-              * 600m intervals: multiply number of intervals by 0.6
-              * 400m intervals: multiply number of intervals by 0.4
-              * 200m intervals: multiply number of intervals by 0.2
-              * Add 6.4 km (4 miles) for warm-up and cool-down to each interval session
-            - For hill strides, count them as 100m each
-            - For rest days, set distance to 0
-            
-            Example calculations:
-            - "5m easy + 4 x 12 sec strides" = 5 miles = 8.05 km (strides don't add significant distance)
-            - "6 x 800 @ 2.30 off 2mins + 4 x 400 @ 65s off 1min" = (6 * 0.8) + (4 * 0.4) + 6.4 = 12.8 km
-            - "7 x 600m on grass off 90sec + 4 x 200m @ 32s off 30sec rec" = (7 * 0.6) + (4 * 0.2) + 6.4 = 11.4 km
-            
-            Return the data in this JSON format:
-            {
-                "title": "Plan title",
-                "duration_weeks": number of weeks,
-                "weekly_structure": [
-                    {
-                        "week_number": week number,
-                        "total_distance": total km for the week,
-                        "workouts": [
-                            {
-                                "day": "day name",
-                                "workout_type": "type of workout",
-                                "distance": calculated total distance in km,
-                                "description": "full workout description"
-                            }
-                        ]
-                    }
-                ]
-            }"""
-
-            response = await self.client.chat.completions.create(
+            # Shrink phone-sized photos off the event loop, then encode straight into the data URL
+            image_bytes = await asyncio.to_thread(_downscale_image, image_bytes)
+            image_url = _DATA_URL_PREFIX + base64.b64encode(image_bytes).decode("ascii")
+            response = await self._vision_completion(
                 model="gpt-4o",
                 messages=[
                     {
                         "role": "user",
                         "content": [
-                            {"type": "text", "text": vision_prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
+                            _VISION_PROMPT_PART,
+                            {"type": "image_url", "image_url": {"url": image_url}}
                         ]
                     }
                 ],
                 max_tokens=6000,
-                response_format={ "type": "json_object" }
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "training_plan", "strict": True, "schema": PLAN_SCHEMA}
+                }
             )
             
             # Parse the JSON response
             content = response.choices[0].message.content
-            return json.loads(content)
+            # Distances and weekly totals are worked out here rather than left to the model
+            return _fill_week_totals(self._fill_workout_distances(orjson.loads(content)))
             
         except Exception as e:
             raise Exception(f"Error analyzing image: {str(e)}")
 
     async def save_parsed_plan(self, plan_data: dict, user_id: int, db: Session) -> SQLModelTrainingPlan:
         """Save the parsed training plan to the database."""
+        # The session is synchronous, so its commits run in a worker thread, not on the event loop
+        return await asyncio.to_thread(self._save_parsed_plan, plan_data, user_id, db)
+
+    def _save_parsed_plan(self, plan_data: dict, user_id: int, db: Session) -> SQLModelTrainingPlan:
         try:
             print(f"DEBUG: Starting to save plan for user {user_id}")
             print(f"DEBUG: Plan data: {plan_data}")
             
+            start_date = datetime.utcnow().date()
+            weekly_distances = _weekly_distances(plan_data)
+            
             # Create the training plan
             training_plan = SQLModelTrainingPlan(
                 user_id=user_id,
                 name=plan_data.get("title", "Untitled Plan"),
-                start_date=datetime.utcnow().date(),
-                end_date=datetime.utcnow().date() + timedelta(weeks=len(plan_data.get("weekly_structure", []))),
+                start_date=start_date,
+                end_date=start_date + timedelta(weeks=len(plan_data.get("weekly_structure", []))),
                 goal_type="General Training",
-                base_mileage=0.0,  # Will calculate from workouts
-                peak_mileage=0.0,  # Will calculate from workouts
+                # First and biggest week, in km
+                base_mileage=round(float(weekly_distances[0]), 2) if weekly_distances.size else 0.0,
+                peak_mileage=round(float(weekly_distances.max()), 2) if weekly_distances.size else 0.0,
                 long_run_day="Sunday",
                 workout_days=json.dumps(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
             )
             
-            # Add to database and commit
+            # Flush for the plan's ID; it is committed together with its trainings below
             db.add(training_plan)
-            db.commit()
-            db.refresh(training_plan)
+            db.flush()
             print(f"DEBUG: Saved training plan with ID: {training_plan.id}")
             
-            # Create individual training entries
-            start_date = datetime.utcnow().date()
-            created_trainings = []
-            
-            # Map workout types to our enum
-            workout_type_mapping = {
-                "Easy Run": WorkoutType.EASY_RUN,
-                "Long Run": WorkoutType.LONG_RUN,
-                "Tempo": WorkoutType.TEMPO,
-                "Intervals": WorkoutType.INTERVALS,
-                "Hills": WorkoutType.HILLS,
-                "Recovery": WorkoutType.RECOVERY,
-                "Rest": WorkoutType.REST
-            }
+            # Create individual training entries; workout dates are day ordinals from the start date
+            start_ordinal = start_date.toordinal()
+            plan_title = plan_data.get("title", "Untitled Plan")
+            # Rows keyed by (date, type), the uq_training_plan_day key for plan workouts
+            rows = {}
             
             print(f"DEBUG: Processing {len(plan_data.get('weekly_structure', []))} weeks")
             
             for week_data in plan_data.get("weekly_structure", []):
                 week_number = week_data.get("week_number", 1)
-                week_start = start_date + timedelta(weeks=week_number - 1)
+                week_ordinal = start_ordinal + (week_number - 1) * 7
                 print(f"DEBUG: Processing week {week_number} with {len(week_data.get('workouts', []))} workouts")
                 
                 for workout in week_data.get("workouts", []):
@@ -229,42 +475,70 @@ class PlanParserService:
                     
                     # Calculate workout date
                     day_name = workout.get("day", "Monday")
-                    day_offset = self._get_day_offset(day_name)
-                    workout_date = week_start + timedelta(days=day_offset)
+                    workout_date = date.fromordinal(week_ordinal + _DAY_OFFSETS.get(day_name.lower(), 0))
                     
                     # Map workout type
-                    workout_type = workout_type_mapping.get(
-                        workout.get("workout_type", "Easy Run"),
+                    workout_type = _WORKOUT_TYPE_MAPPING.get(
+                        workout.get("workout_type", "Easy Run").strip().lower(),
                         WorkoutType.EASY_RUN
                     )
                     
+                    row = rows.get((workout_date, workout_type))
+                    if row is not None:
+                        # Same-day double of the same type: merge it into one training
+                        print(f"DEBUG: Merging double {workout.get('workout_type')} on {workout_date}")
+                        row["description"] = f"{row['description']} + {workout.get('description', '')}"
+                        if row["distance"] is not None and workout.get("distance") is not None:
+                            row["distance"] += workout["distance"]
+                        continue
+                    
                     print(f"DEBUG: Creating training for {workout_date}: {workout.get('workout_type')} - {workout.get('description')}")
                     
-                    # Create training entry
-                    training = Training(
-                        user_id=user_id,
-                        date=workout_date,
-                        type=workout_type,
-                        title=workout.get("workout_type", "Easy Run"),
-                        description=workout.get("description", ""),
-                        distance=workout.get("distance"),
-                        plan_source="coach_photo",
-                        plan_title=plan_data.get("title", "Untitled Plan")
+                    # Training row; the rows are only inserted, so they skip the ORM
+                    rows[(workout_date, workout_type)] = {
+                        "user_id": user_id,
+                        "date": workout_date,
+                        "type": workout_type,
+                        "status": WorkoutStatus.PLANNED,
+                        "title": workout.get("workout_type", "Easy Run"),
+                        "description": workout.get("description", ""),
+                        "distance": workout.get("distance"),
+                        "plan_source": "coach_photo",
+                        "plan_title": plan_title
+                    }
+            
+            # Earlier photo-plan workouts on the same (date, type): planned ones are replaced by
+            # the new plan, ones already completed or modified are kept in place of the new workout
+            replaced = []
+            if rows:
+                existing = db.exec(
+                    select(Training.id, Training.date, Training.type, Training.status).where(
+                        Training.user_id == user_id,
+                        Training.plan_source == "coach_photo",
+                        Training.date.in_({workout_date for workout_date, _ in rows})
                     )
-                    
-                    db.add(training)
-                    created_trainings.append(training)
+                ).all()
+                for training_id, training_date, training_type, status in existing:
+                    if (training_date, training_type) not in rows:
+                        continue
+                    if status == WorkoutStatus.PLANNED:
+                        replaced.append(training_id)
+                    else:
+                        print(f"DEBUG: Keeping {status} {training_type} on {training_date}; new workout not added")
+                        del rows[(training_date, training_type)]
+            if replaced:
+                print(f"DEBUG: Replacing {len(replaced)} planned workouts from earlier plans")
+                db.execute(delete(Training).where(Training.id.in_(replaced)))
+            created_trainings = list(rows.values())
             
             print(f"DEBUG: Created {len(created_trainings)} training entries")
             
-            # Commit all training entries
+            # Insert all training entries as one Core executemany, then commit plan and trainings at once
+            if created_trainings:
+                db.execute(insert(Training), created_trainings)
             db.commit()
             print(f"DEBUG: Committed all training entries")
             
-            # Refresh all trainings to get their IDs
-            for training in created_trainings:
-                db.refresh(training)
-            
             print(f"DEBUG: Successfully saved plan with {len(created_trainings)} workouts")
             return training_plan
             
@@ -272,11 +546,3 @@ class PlanParserService:
             print(f"DEBUG: Error saving plan: {str(e)}")
             db.rollback()
             raise Exception(f"Error saving plan: {str(e)}")
-    
-    def _get_day_offset(self, day_name: str) -> int:
-        """Convert day name to offset from Monday"""
-        days = {
-            "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-            "friday": 4, "saturday": 5, "sunday": 6
-        }
-        return days.get(day_name.lower(), 0) 
\ No newline at end of file